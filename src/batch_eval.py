@@ -0,0 +1,60 @@
+"""
+    Batch evaluation of many positions at once with NumPy.
+
+    Boards come in as an (N, 5, 5) or (N, 25) int8 array, or as N pairs
+    of bit masks. The 12 line counts of every board are one matrix
+    product, and the line scores one lookup in a table indexed by
+    (x_count, o_count). NumPy is optional: HAS_NUMPY tells whether this
+    module can be used.
+"""
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+from bitboard import CELLS
+from lines import LINE_MASKS
+
+if HAS_NUMPY:
+    # (25, 12) incidence matrix of cells and lines.
+    LINE_INCIDENCE = np.array([[(line >> cell) & 1 for line in LINE_MASKS] for cell in range(CELLS)], dtype=np.int8)
+    _SHIFTS = np.arange(CELLS, dtype=np.int64)
+else:
+    LINE_INCIDENCE = None
+
+
+# (N, 25) int8 boards of -1/0/1 from N pairs of bit masks.
+def masks_to_array(xs, os):
+    xs = np.asarray(xs, dtype=np.int64)[:, None]
+    os = np.asarray(os, dtype=np.int64)[:, None]
+    return (((xs >> _SHIFTS) & 1) - ((os >> _SHIFTS) & 1)).astype(np.int8)
+
+
+# (N, 12) X and O piece counts of every line of N boards.
+def count_lines(boards):
+    boards = np.asarray(boards, dtype=np.int8).reshape(-1, CELLS)
+    x_counts = (boards == 1).astype(np.int8) @ LINE_INCIDENCE
+    o_counts = (boards == -1).astype(np.int8) @ LINE_INCIDENCE
+    return x_counts, o_counts
+
+
+class BatchEvaluator:
+    # line_scores[x_count][o_count] is the score of one line from X's
+    # point of view, as in IncrementalEvaluator.
+    def __init__(self, line_scores):
+        if not HAS_NUMPY:
+            raise ImportError("BatchEvaluator needs numpy")
+        self.table = np.array(line_scores, dtype=np.int32)
+
+    # Scores of N boards from bot_symbol's point of view.
+    def evaluate(self, boards, bot_symbol=1):
+        x_counts, o_counts = count_lines(boards)
+        scores = self.table[x_counts, o_counts].sum(axis=1)
+        return scores if bot_symbol == 1 else -scores
+
+    def evaluate_masks(self, xs, os, bot_symbol=1):
+        return self.evaluate(masks_to_array(xs, os), bot_symbol)
+
@@ -0,0 +1,304 @@
+"""
+    Benchmarks for the search engine.
+
+    Positions come from seeded games between two QuixoRandomBot
+    instances, so every run measures the same corpus.
+
+    python benchmark.py micro --save baseline.json
+    python benchmark.py compare baseline.json --threshold 0.1
+    python benchmark.py parallel --workers 1 2 4 8 --budget 1.0
+    python benchmark.py pvs --depth 4 --budget 1.0
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from functools import partial
+
+from bitboard import BitBoard
+from quixo_bot import GameNode, QuixoBot
+from quixo_random import QuixoRandomBot
+
+# Each case is timed for at least this many seconds.
+MIN_TIME = 0.2
+ROUNDS = 3
+PLAY_TURN_DEPTHS = (1, 2, 3)
+PVS_MODES = (('alpha-beta', {}), ('pvs', {'pvs': True}), ('pvs+lmr', {'pvs': True, 'lmr': True}))
+
+
+def position_corpus(count, seed=0, max_turns=40):
+    # One position per game, taken after a random number of turns.
+    rng = random.Random(seed)
+    state = random.getstate()
+    positions = []
+    try:
+        while len(positions) < count:
+            random.seed(rng.getrandbits(32))
+            players = [QuixoRandomBot(1), QuixoRandomBot(-1)]
+            board = [[0] * 5 for _ in range(5)]
+            turns = rng.randint(0, max_turns)
+            for turn in range(turns):
+                players[turn % 2].play_turn(board)
+            symbol = 1 if turns % 2 == 0 else -1
+            positions.append(([row[:] for row in board], symbol))
+    finally:
+        random.setstate(state)
+    return positions
+
+
+def bench_parallel(worker_counts, budget, positions):
+    results = []
+    for workers in worker_counts:
+        bots = {symbol: QuixoBot(symbol, time_budget=budget, workers=workers) for symbol in (1, -1)}
+        nodes = 0
+        depth = 0
+        elapsed = 0.0
+        try:
+            for board, symbol in positions:
+                bot = bots[symbol]
+                bot.reset(symbol)
+                start = time.perf_counter()
+                bot.play_turn([row[:] for row in board])
+                elapsed += time.perf_counter() - start
+                nodes += bot.last_nodes
+                depth += bot.last_depth
+        finally:
+            for bot in bots.values():
+                bot.close()
+        results.append({
+            'workers': workers,
+            'nps': nodes / elapsed,
+            'avg_depth': depth / len(positions),
+            'avg_time': elapsed / len(positions),
+        })
+    base = results[0]['nps']
+    for result in results:
+        result['speedup'] = result['nps'] / base
+    return results
+
+
+# The play_turn bots run without a transposition table and with fresh
+# ordering tables, so every call repeats the same search.
+# Searches every position to a fixed depth in each PVS_MODES mode, and
+# with budget also as a timed search with the default table. A fresh bot
+# per position keeps the tables of one search from helping the next.
+# same_move and same_value count the root moves and values that agree
+# with plain alpha-beta at the fixed depth; without a transposition table
+# PVS without reductions must agree on every one (with a table, equal
+# values can break differently).
+def bench_pvs(positions, depth, budget=None, tt_size_mb=0):
+    results = []
+    reference = None
+    for name, options in PVS_MODES:
+        moves = []
+        values = []
+        nodes = 0
+        reduced = 0
+        researched = 0
+        elapsed = 0.0
+        timed_depth = 0
+        for board, symbol in positions:
+            bot = QuixoBot(symbol, time_budget=None, depth=depth, tt_size_mb=tt_size_mb, **options)
+            start = time.perf_counter()
+            bot.play_turn([row[:] for row in board])
+            elapsed += time.perf_counter() - start
+            nodes += bot.last_nodes
+            reduced += bot.searcher.reduced
+            researched += bot.searcher.researched
+            moves.append(bot.last_move)
+            values.append(bot.last_value)
+            if budget is not None:
+                bot = QuixoBot(symbol, time_budget=budget, **options)
+                bot.play_turn([row[:] for row in board])
+                timed_depth += bot.last_depth
+        if reference is None:
+            reference = moves, values
+        results.append({
+            'mode': name,
+            'nodes': nodes,
+            'reduced': reduced,
+            'researched': researched,
+            'time': elapsed,
+            'same_move': sum(a == b for a, b in zip(moves, reference[0])),
+            'same_value': sum(a == b for a, b in zip(values, reference[1])),
+            'avg_timed_depth': timed_depth / len(positions) if budget is not None else None,
+        })
+    return results
+
+
+def _play_turn(bot, board):
+    bot.orderer.clear()
+    bot.play_turn([row[:] for row in board])
+
+
+# The calls of every micro benchmark over the corpus, one partial per
+# call.
+def micro_cases(positions, depths=PLAY_TURN_DEPTHS):
+    bots = {symbol: QuixoBot(symbol, time_budget=None) for symbol in (1, -1)}
+    boards = [(BitBoard.from_list(board), symbol) for board, symbol in positions]
+    cases = {
+        'generate_moves': [partial(bots[symbol].generate_moves, board, symbol) for board, symbol in boards],
+        'apply_move': [partial(bots[symbol].apply_move, board, move, symbol)
+                       for board, symbol in boards for move in board.generate_moves(symbol)],
+        'is_winner': [partial(bots[symbol].is_winner, board, symbol) for board, symbol in boards],
+        'GameNode.evaluate': [partial(GameNode(board).evaluate, symbol, -symbol) for board, symbol in boards],
+        'prioritize_moves': [partial(bots[symbol].prioritize_moves, board.generate_moves(symbol), board, symbol)
+                             for board, symbol in boards],
+    }
+    for depth in depths:
+        players = {symbol: QuixoBot(symbol, time_budget=None, depth=depth, tt_size_mb=0) for symbol in (1, -1)}
+        cases['play_turn_depth_%d' % depth] = [partial(_play_turn, players[symbol], board)
+                                               for board, symbol in positions]
+    return cases
+
+
+def bench_calls(calls, min_time=MIN_TIME, rounds=ROUNDS):
+    # Best ops/sec of a few rounds of repeated passes after a warm-up
+    # pass, then one traced pass for the bytes allocated per call (the
+    # tracemalloc peak during the call) and the peak of the whole pass.
+    for call in calls:
+        call()
+    best = 0.0
+    for _ in range(rounds):
+        ops = 0
+        start = time.perf_counter()
+        while True:
+            for call in calls:
+                call()
+            ops += len(calls)
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        best = max(best, ops / elapsed)
+    tracemalloc.start()
+    try:
+        allocated = 0
+        peak = 0
+        for call in calls:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            call()
+            call_peak = tracemalloc.get_traced_memory()[1]
+            allocated += call_peak - before
+            peak = max(peak, call_peak)
+    finally:
+        tracemalloc.stop()
+    return {
+        'ops_per_sec': best,
+        'alloc_bytes_per_call': allocated / len(calls),
+        'peak_bytes': peak,
+    }
+
+
+def bench_micro(positions, min_time=MIN_TIME):
+    return {name: bench_calls(calls, min_time) for name, calls in micro_cases(positions).items()}
+
+
+def save_baseline(path, results, args):
+    with open(path, 'w') as f:
+        json.dump({
+            'python': sys.version.split()[0],
+            'machine': platform.machine(),
+            'positions': args.positions,
+            'seed': args.seed,
+            'results': results,
+        }, f, indent=2)
+
+
+# Cases whose ops/sec fell, or whose allocations grew, by more than
+# threshold (a fraction) against the baseline.
+def find_regressions(baseline, results, threshold):
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['ops_per_sec'] < base['ops_per_sec'] * (1 - threshold):
+            regressions.append((name, 'ops_per_sec', base['ops_per_sec'], result['ops_per_sec']))
+        if result['alloc_bytes_per_call'] > base['alloc_bytes_per_call'] * (1 + threshold) + 1:
+            regressions.append((name, 'alloc_bytes_per_call', base['alloc_bytes_per_call'],
+                                result['alloc_bytes_per_call']))
+    return regressions
+
+
+def print_micro(results, baseline=None):
+    print("%-20s %14s %12s %12s %9s" % ("case", "ops/sec", "bytes/call", "peak bytes", "change"))
+    for name, r in results.items():
+        change = ""
+        if baseline is not None and name in baseline:
+            change = "%+8.1f%%" % (100 * (r['ops_per_sec'] / baseline[name]['ops_per_sec'] - 1))
+        print("%-20s %14.0f %12.1f %12d %9s" % (name, r['ops_per_sec'], r['alloc_bytes_per_call'],
+                                               r['peak_bytes'], change))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="QuixoBot benchmarks")
+    commands = parser.add_subparsers(dest='command', required=True)
+    parallel = commands.add_parser('parallel', help="speedup of the parallel search against worker count")
+    parallel.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parallel.add_argument('--budget', type=float, default=1.0)
+    parallel.add_argument('--positions', type=int, default=20)
+    parallel.add_argument('--seed', type=int, default=0)
+    micro = commands.add_parser('micro', help="ops/sec and allocations of the hot paths")
+    compare = commands.add_parser('compare', help="run the micro benchmarks against a saved baseline")
+    compare.add_argument('baseline')
+    compare.add_argument('--threshold', type=float, default=0.1,
+                         help="flag changes larger than this fraction (default 0.1)")
+    micro.add_argument('--save', metavar='PATH', help="write the results as a JSON baseline")
+    pvs = commands.add_parser('pvs', help="node counts of PVS and late-move reductions against alpha-beta")
+    pvs.add_argument('--depth', type=int, default=4)
+    pvs.add_argument('--budget', type=float, default=None, help="also compare the depth reached in this time")
+    pvs.add_argument('--tt-size-mb', type=int, default=0, help="table of the fixed-depth searches")
+    pvs.add_argument('--positions', type=int, default=50)
+    pvs.add_argument('--seed', type=int, default=0)
+    for command in (micro, compare):
+        command.add_argument('--positions', type=int, default=50)
+        command.add_argument('--seed', type=int, default=0)
+        command.add_argument('--min-time', type=float, default=MIN_TIME)
+    args = parser.parse_args()
+
+    if args.command == 'micro':
+        results = bench_micro(position_corpus(args.positions, args.seed), args.min_time)
+        print_micro(results)
+        if args.save:
+            save_baseline(args.save, results, args)
+    elif args.command == 'compare':
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        results = bench_micro(position_corpus(baseline['positions'], baseline['seed']), args.min_time)
+        print_micro(results, baseline['results'])
+        regressions = find_regressions(baseline['results'], results, args.threshold)
+        for name, metric, before, after in regressions:
+            print("REGRESSION %s %s: %.1f -> %.1f" % (name, metric, before, after))
+        if regressions:
+            sys.exit(1)
+    elif args.command == 'parallel':
+        positions = position_corpus(args.positions, args.seed)
+        print("workers      nps  avg depth  avg time  speedup")
+        for r in bench_parallel(args.workers, args.budget, positions):
+            print("%7d %8.0f %10.2f %9.3f %8.2f" % (r['workers'], r['nps'], r['avg_depth'], r['avg_time'], r['speedup']))
+    elif args.command == 'pvs':
+        positions = position_corpus(args.positions, args.seed)
+        results = bench_pvs(positions, args.depth, args.budget, args.tt_size_mb)
+        base = results[0]['nodes']
+        print("mode            nodes  vs a-b   reduced  re-searched    time  same move  same value  timed depth")
+        for r in results:
+            timed = '%.2f' % r['avg_timed_depth'] if r['avg_timed_depth'] is not None else '-'
+            print("%-10s %10d %7.2f %9d %12d %7.2f %6d/%d %8d/%d %12s" % (
+                r['mode'], r['nodes'], r['nodes'] / base, r['reduced'], r['researched'], r['time'],
+                r['same_move'], len(positions), r['same_value'], len(positions), timed))
+        # Without reductions (or a table) PVS must find the same moves and
+        # values as alpha-beta.
+        pvs_result = results[1]
+        if args.tt_size_mb == 0 and min(pvs_result['same_move'], pvs_result['same_value']) != len(positions):
+            print("MISMATCH: pvs disagrees with alpha-beta on %d positions"
+                  % (len(positions) - min(pvs_result['same_move'], pvs_result['same_value'])))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+    Compact Quixo board: one 25-bit mask per symbol.
+
+    Cell (row, col) is stored in bit row * 5 + col. Every legal edge move
+    is precomputed once, so applying a move is a handful of integer
+    operations instead of a deepcopy and a Python loop.
+"""
+
+SIZE = 5
+CELLS = SIZE * SIZE
+FULL = (1 << CELLS) - 1
+
+DIRECTIONS = ['right', 'left', 'up', 'down']
+EDGE_CELLS = [(row, col) for row in range(SIZE) for col in range(SIZE)
+              if row in (0, SIZE - 1) or col in (0, SIZE - 1)]
+
+
+def cell_bit(row, col):
+    return 1 << (row * SIZE + col)
+
+
+def _build_moves():
+    # For each move: the picked cell, the cell it is pushed into, the span
+    # of cells that change, the part of the span that slides and how far.
+    # Moves are numbered cell by cell, so the moves of one cell have
+    # consecutive ids.
+    table = []
+    for row, col in EDGE_CELLS:
+        for direction in DIRECTIONS:
+            if direction == 'right' and col < SIZE - 1:
+                cells = [(row, c) for c in range(col, SIZE)]
+                shr, shl = 1, 0
+            elif direction == 'left' and col > 0:
+                cells = [(row, c) for c in range(0, col + 1)]
+                shr, shl = 0, 1
+            elif direction == 'up' and row > 0:
+                cells = [(r, col) for r in range(0, row + 1)]
+                shr, shl = 0, SIZE
+            elif direction == 'down' and row < SIZE - 1:
+                cells = [(r, col) for r in range(row, SIZE)]
+                shr, shl = SIZE, 0
+            else:
+                continue
+            dest = cells[-1] if direction in ('right', 'down') else cells[0]
+            span = 0
+            for r, c in cells:
+                span |= cell_bit(r, c)
+            src_bit = cell_bit(row, col)
+            dest_bit = cell_bit(*dest)
+            # Everything in the span except the picked cell slides towards it.
+            seg = span & ~src_bit
+            table.append((direction, (row, col), src_bit, dest_bit, span, seg, shr, shl))
+    return table
+
+
+_MOVES = _build_moves()
+
+NUM_MOVES = len(_MOVES)
+MOVE_DIRECTION = [m[0] for m in _MOVES]
+MOVE_CELL = [m[1] for m in _MOVES]
+MOVE_SRC = [m[2] for m in _MOVES]
+MOVE_DEST = [m[3] for m in _MOVES]
+MOVE_SPAN = [m[4] for m in _MOVES]
+MOVE_SEG = [m[5] for m in _MOVES]
+MOVE_SHR = [m[6] for m in _MOVES]
+MOVE_SHL = [m[7] for m in _MOVES]
+MOVE_OUTSIDE = [FULL & ~m[4] for m in _MOVES]
+ALL_MOVES = list(range(NUM_MOVES))
+
+_MOVE_IDS = {(m[0], m[1]): i for i, m in enumerate(_MOVES)}
+
+# ROW_MOVES[row][bits]: the moves from the edge cells of that row, in id
+# order, when bits (5 bits) are the opponent's cells in the row. Since
+# ids go cell by cell, the legal moves of a board are the five row
+# entries one after another.
+ROW_MOVES = [[tuple(m for m in ALL_MOVES if MOVE_CELL[m][0] == row and not (bits << (row * SIZE)) & MOVE_SRC[m])
+              for bits in range(1 << SIZE)] for row in range(SIZE)]
+
+
+def encode_move(direction, row, col):
+    return _MOVE_IDS[(direction, (row, col))]
+
+
+def decode_move(move):
+    return MOVE_DIRECTION[move], MOVE_CELL[move]
+
+
+def shift_mask(mask, move):
+    span = MOVE_SPAN[move]
+    return (mask & ~span) | (((mask & MOVE_SEG[move]) >> MOVE_SHR[move]) << MOVE_SHL[move])
+
+
+def apply_move(x, o, move, symbol):
+    # The destination cell is left empty by the slide and receives the
+    # mover's piece.
+    x = shift_mask(x, move)
+    o = shift_mask(o, move)
+    if symbol == 1:
+        x |= MOVE_DEST[move]
+    else:
+        o |= MOVE_DEST[move]
+    return x, o
+
+
+def generate_moves(x, o, symbol):
+    opp = o if symbol == 1 else x
+    r0, r1, r2, r3, r4 = ROW_MOVES
+    return [*r0[opp & 31], *r1[opp >> 5 & 31], *r2[opp >> 10 & 31], *r3[opp >> 15 & 31], *r4[opp >> 20]]
+
+
+# Same moves written into buffer, a list of NUM_MOVES items that the
+# caller keeps and reuses: each row's moves are copied in at a running
+# offset, nothing is allocated and the buffer keeps its length. Returns
+# how many were written; the items after them are left over from earlier
+# calls.
+def generate_moves_into(x, o, symbol, buffer):
+    opp = o if symbol == 1 else x
+    r0, r1, r2, r3, r4 = ROW_MOVES
+    moves = r0[opp & 31]
+    end = len(moves)
+    buffer[:end] = moves
+    moves = r1[opp >> 5 & 31]
+    start, end = end, end + len(moves)
+    buffer[start:end] = moves
+    moves = r2[opp >> 10 & 31]
+    start, end = end, end + len(moves)
+    buffer[start:end] = moves
+    moves = r3[opp >> 15 & 31]
+    start, end = end, end + len(moves)
+    buffer[start:end] = moves
+    moves = r4[opp >> 20]
+    start, end = end, end + len(moves)
+    buffer[start:end] = moves
+    return end
+
+
+# Maps every board reachable in one move to the move that reaches it.
+# With changed (the cells that differ from a submitted board) only the
+# moves whose span covers those cells are built, since no other move
+# can produce that board.
+def legal_successors(x, o, symbol, changed=None):
+    successors = {}
+    for move in generate_moves(x, o, symbol):
+        if changed is not None and changed & MOVE_OUTSIDE[move]:
+            continue
+        successors.setdefault(apply_move(x, o, move, symbol), move)
+    return successors
+
+
+# Returns the move that turns (x, o) into (new_x, new_o), or None if no
+# legal move does.
+def find_move(x, o, new_x, new_o, symbol):
+    changed = (x ^ new_x) | (o ^ new_o)
+    return legal_successors(x, o, symbol, changed).get((new_x, new_o))
+
+
+# Like BitBoard.from_list, but returns (x, o), or None for anything that
+# is not a 5x5 board of -1, 0 and 1 (a board submitted by a player).
+def board_masks(board):
+    if not isinstance(board, list) or len(board) != SIZE:
+        return None
+    x = 0
+    o = 0
+    bit = 1
+    for row in board:
+        if not isinstance(row, list) or len(row) != SIZE:
+            return None
+        for cell in row:
+            if cell == 1:
+                x |= bit
+            elif cell == -1:
+                o |= bit
+            elif cell != 0:
+                return None
+            bit <<= 1
+    return x, o
+
+
+class BitBoard:
+    __slots__ = ('x', 'o', 'history')
+
+    def __init__(self, x=0, o=0):
+        self.x = x
+        self.o = o
+        self.history = []
+
+    @classmethod
+    def from_list(cls, board):
+        x = 0
+        o = 0
+        bit = 1
+        for row in board:
+            for cell in row:
+                if cell == 1:
+                    x |= bit
+                elif cell == -1:
+                    o |= bit
+                bit <<= 1
+        return cls(x, o)
+
+    def to_list(self):
+        board = [[0] * SIZE for _ in range(SIZE)]
+        for row in range(SIZE):
+            for col in range(SIZE):
+                bit = cell_bit(row, col)
+                if self.x & bit:
+                    board[row][col] = 1
+                elif self.o & bit:
+                    board[row][col] = -1
+        return board
+
+    def copy(self):
+        return BitBoard(self.x, self.o)
+
+    def key(self):
+        return self.x, self.o
+
+    def get(self, row, col):
+        bit = cell_bit(row, col)
+        if self.x & bit:
+            return 1
+        if self.o & bit:
+            return -1
+        return 0
+
+    def is_full(self):
+        return (self.x | self.o) == FULL
+
+    def generate_moves(self, symbol):
+        return generate_moves(self.x, self.o, symbol)
+
+    def apply(self, move, symbol):
+        return BitBoard(*apply_move(self.x, self.o, move, symbol))
+
+    # make/unmake mutate this board in place so a search can walk the
+    # whole tree on a single object.
+    def make(self, move, symbol):
+        self.history.append((self.x, self.o))
+        self.x, self.o = apply_move(self.x, self.o, move, symbol)
+
+    def unmake(self):
+        self.x, self.o = self.history.pop()
+
+    def __eq__(self, other):
+        return isinstance(other, BitBoard) and self.x == other.x and self.o == other.o
+
+    def __hash__(self):
+        return hash((self.x, self.o))
+
+    def __repr__(self):
+        return "BitBoard(x=%#09x, o=%#09x)" % (self.x, self.o)
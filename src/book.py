@@ -0,0 +1,161 @@
+"""
+    Opening book built offline.
+
+    Every position reachable in the first plies from the empty board is
+    searched once, deeply, and its best move stored. Positions are keyed
+    from the mover's point of view (mover's mask, opponent's mask) and
+    reduced to their canonical image under the 8 board symmetries, so
+    one entry serves both colours and all rotations and reflections.
+
+    The file is a header followed by fixed-size records sorted by key.
+    Book opens it through mmap and binary-searches it in place, so
+    loading costs nothing and pool workers share the pages.
+
+    python book.py build quixo.book --plies 4 --depth 6 --workers 8
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bitboard import BitBoard, apply_move, generate_moves
+from lines import five_in_a_row
+from symmetry import canonical, from_canonical_move
+
+# Version 2: move ids numbered cell by cell.
+MAGIC = b'QXBK0002'
+HEADER = struct.Struct('<8sI')
+# key, move, depth, value (mover's point of view)
+RECORD = struct.Struct('<QBBi')
+
+_bot = None
+
+
+def book_key(mover, opponent):
+    # Canonical key of a position and the transform that maps it there.
+    cm, co, t = canonical(mover, opponent)
+    return cm << 25 | co, t
+
+
+class Book:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.size = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or len(self.map) != HEADER.size + self.size * RECORD.size:
+            self.map.close()
+            raise ValueError("%s is not a Quixo opening book" % path)
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        self.map.close()
+
+    def __len__(self):
+        return self.size
+
+    def entry(self, index):
+        return RECORD.unpack_from(self.map, HEADER.size + index * RECORD.size)
+
+    # Returns (move, depth, value) for symbol to move on (x, o), or None.
+    def probe(self, x, o, symbol):
+        mover, opponent = (x, o) if symbol == 1 else (o, x)
+        key, t = book_key(mover, opponent)
+        low, high = 0, self.size
+        while low < high:
+            mid = (low + high) // 2
+            mid_key = struct.unpack_from('<Q', self.map, HEADER.size + mid * RECORD.size)[0]
+            if mid_key < key:
+                low = mid + 1
+            else:
+                high = mid
+        if low < self.size:
+            entry_key, move, depth, value = self.entry(low)
+            if entry_key == key:
+                self.hits += 1
+                return from_canonical_move(move, t), depth, value
+        self.misses += 1
+        return None
+
+
+# Canonical positions (mover, opponent) first reached at each of the
+# first plies plies, starting from the empty board.
+def opening_positions(plies):
+    layer = {book_key(0, 0)[0]: (0, 0)}
+    seen = set(layer)
+    positions = []
+    for _ in range(plies):
+        positions.extend(layer.values())
+        next_layer = {}
+        for mover, opponent in layer.values():
+            for move in generate_moves(mover, opponent, 1):
+                new_mover, new_opponent = apply_move(mover, opponent, move, 1)
+                x_five, o_five = five_in_a_row(new_mover, new_opponent)
+                if x_five or o_five:
+                    continue
+                key, _ = book_key(new_opponent, new_mover)
+                if key not in seen:
+                    seen.add(key)
+                    next_layer[key] = canonical(new_opponent, new_mover)[:2]
+        layer = next_layer
+    return positions
+
+
+def _init_worker(bot_options):
+    global _bot
+    from quixo_bot import QuixoBot
+    _bot = QuixoBot(1, **bot_options)
+
+
+# Searches one canonical position with the mover as X.
+def _search_position(position, depth):
+    mover, opponent = position
+    if _bot.tt is not None:
+        _bot.tt.new_search()
+    _bot.orderer.new_search()
+    move, value = _bot.searcher.search(BitBoard(mover, opponent), depth)
+    return mover << 25 | opponent, move, depth, int(value)
+
+
+def build(path, plies=4, depth=6, workers=1, bot_options=None, log=print):
+    start = time.perf_counter()
+    positions = opening_positions(plies)
+    log("%d positions in the first %d plies" % (len(positions), plies))
+    options = dict(bot_options or {}, time_budget=None)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(options,)) as executor:
+        records = [record for record in executor.map(_search_position, positions, [depth] * len(positions),
+                                                     chunksize=16)
+                   if record[1] is not None]
+    records.sort()
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(records)))
+        for record in records:
+            f.write(RECORD.pack(*record))
+    os.replace(tmp_path, path)
+    log("%d entries written to %s in %.1fs" % (len(records), path, time.perf_counter() - start))
+    return len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quixo opening book")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_parser = commands.add_parser('build', help="search the first plies and write the book")
+    build_parser.add_argument('path')
+    build_parser.add_argument('--plies', type=int, default=4)
+    build_parser.add_argument('--depth', type=int, default=6)
+    build_parser.add_argument('--workers', type=int, default=1)
+    build_parser.add_argument('--options', type=json.loads, default={},
+                              help="QuixoBot options as JSON, e.g. '{\"tt_size_mb\": 64}'")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build(args.path, args.plies, args.depth, args.workers, args.options)
+
+
+if __name__ == "__main__":
+    main()
@@ -17,15 +17,46 @@ sys.path.append(func_dir)
 
 import quixo_bot as qb
 import quixo_random as qr
+from bitboard import BitBoard, board_masks, find_move
+from player_process import PlayerProcess
 
 class QuixoReferee:
-    def __init__(self, player1, player2):
+    # verbose=False silences the per-turn output (used by the tournament
+    # runner). move_timeout is the time each player gets per move. With
+    # collect_stats the last_stats of every legal move of a player that
+    # has them (QuixoBot(instrument=True)) are kept in search_stats.
+    # processes=True runs each player in its own worker process (see
+    # player_process.py): the players are then given as (module:Class,
+    # options) specs, which the worker builds. Players that already are a
+    # PlayerProcess always play that way. close() stops the workers the
+    # referee started.
+    # records is a records.GameRecordWriter that gets every legal move and
+    # the result of every game.
+    def __init__(self, player1, player2, verbose=True, move_timeout=1, collect_stats=False, processes=False,
+                 records=None):
         self.board = [[0] * 5 for _ in range(5)]
+        self.own_processes = []
+        if processes:
+            player1, player2 = self.__in_process(player1, 1), self.__in_process(player2, -1)
         # 1
         self.player1 = player1
         # -1
         self.player2 = player2
+        self.verbose = verbose
+        self.move_timeout = move_timeout
         self.losing_boards = []  # Lista para guardar los tableros finales donde kuri bot pierde
+        # Resultado de la última partida: razón del final y faltas por símbolo
+        self.last_reason = None
+        self.last_move = None
+        self.timeouts = defaultdict(int)
+        self.illegal_moves = defaultdict(int)
+        self.collect_stats = collect_stats
+        self.search_stats = defaultdict(list)
+        self.records = records
+
+    def __log(self, *args):
+        if self.verbose:
+            print(*args)
 
     # it can happen that both players win at the same time.
     # if this happens, the player that is not his turn wins.
@@ -67,185 +98,32 @@ class QuixoReferee:
 
         return False, 0
 
-    def __move_right(self, board, row, col, end_col=4):
-        if col == 4:
-            print("Referee::Invalid move. Called move_right with coordinates ", row, col)
-            return board
-        
-        aux = board[row][col]
-        for i in range(col + 1, end_col + 1):
-            board[row][i-1] = board[row][i]
-
-        board[row][end_col] = aux
-
-        return board
-
-    def __move_left(self, board, row, col, end_col=0):
-        if col == 0:
-            print("Referee::Invalid move. Called move_left with coordinates ", row, col)
-            return board
-        
-        aux = board[row][col]
-        for i in range(col - 1, end_col-1, -1):
-            board[row][i+1] = board[row][i]
-        
-        board[row][end_col] = aux
-        return board
-
-    def __move_up(self, board, row, col, end_row = 0):
-        if row == 0:
-            print("Referee::Invalid move. Called move_up with coordinates ", row, col)
-            return board
-        
-        aux = board[row][col]
-        for i in range(row-1, end_row-1, -1):
-            board[i+1][col] = board[i][col]
-        
-        board[end_row][col] = aux
-        return board
-    
-    def __move_down(self, board, row, col, end_row=4):
-        if row == 4:
-            print("Referee::Invalid move. Called move_down with coordinates ", row, col)
-            return board
-
-        aux = board[row][col]
-        for i in range(row + 1, end_row+1):
-            board[i-1][col] = board[i][col]
-
-        board[end_row][col] = aux
-
-        return board
-
-    def __compare_with_movements_top_row(self, new_board, symbol):
-        for i in range(5):
-            if self.board[0][i] == (symbol * -1):
-                continue
-            
-            original_symbol = self.board[0][i]
-            self.board[0][i] = symbol
-
-            self.__move_down(self.board, 0, i)
-            if self.board == new_board:
-                return True
-            
-            self.__move_up(self.board, 4, i)
-
-            if i != 0:
-                self.__move_left(self.board, 0, i)
-                if self.board == new_board:
-                    return True
-                
-                self.__move_right(self.board, 0, 0, i)
-            
-            if i != 4:
-                self.__move_right(self.board, 0, i)
-                if self.board == new_board:
-                    return True
-                self.__move_left(self.board, 0, 4, i)
-
-            self.board[0][i] = original_symbol
-
-        return False
-    
-    def __compare_with_movements_bottom_row(self, new_board, symbol):
-        for i in range(5):
-            if self.board[4][i] == (symbol * -1):
-                continue
-
-            original_symbol = self.board[4][i]
-            self.board[4][i] = symbol
-
-            self.__move_up(self.board, 4, i)
-            if self.board == new_board:
-                return True
-            self.__move_down(self.board, 0, i)
-
-            if i != 0:
-                self.__move_left(self.board, 4, i)
-                if self.board == new_board:
-                    return True
-                self.__move_right(self.board, 4, 0, i)
-
-            if i != 4:
-                self.__move_right(self.board, 4, i)
-                if self.board == new_board:
-                    return True
-                self.__move_left(self.board, 4, 4, i)
-
-            self.board[4][i] = original_symbol
-
-        return False
-
-    def __compare_with_movements_right_col(self, new_board, symbol):
-        for i in range(5):
-            if self.board[i][4] == (symbol * -1):
-                continue
-
-            original_symbol = self.board[i][4]
-            self.board[i][4] = symbol
-
-            self.__move_left(self.board, i, 4)
-            if self.board == new_board:
-                return True
-            self.__move_right(self.board, i, 0)
-
-            if i != 0:
-                self.__move_up(self.board, i, 4)
-                if self.board == new_board:
-                    return True
-                self.__move_down(self.board, 0, 4, i)
-
-            if i != 4:
-                self.__move_down(self.board, i, 4)
-                if self.board == new_board:
-                    return True
-                self.__move_up(self.board, 4, 4, i)
-
-            self.board[i][4] = original_symbol
-
-        return False
-
-    def __compare_with_movements_left_col(self, new_board, symbol):
-        for i in range(5):
-            if self.board[i][0] == (symbol * -1):
-                continue
-            
-            original_symbol = self.board[i][0]
-            self.board[i][0] = symbol
-
-            self.__move_right(self.board, i, 0)
-            if self.board == new_board:
-                return True
-            self.__move_left(self.board, i, 4)
-
-            if i != 0:
-                self.__move_up(self.board, i, 0)
-                if self.board == new_board:
-                    return True
-                self.__move_down(self.board, 0, 0, i)
-
-            if i != 4:
-                self.__move_down(self.board, i, 0)
-                if self.board == new_board:
-                    return True
-                self.__move_up(self.board, 4, 0, i)
-
-            self.board[i][0] = original_symbol
-
-        return False
-    
-    # deepcopy is very slow, so for each movement we are going to mutate
-    # the original board and compare with the new_board. If there's not a match
-    # we return the board to the original state and continue with the new movement
-    def __is_valid_move(self, new_board, symbol):
-        return (self.__compare_with_movements_top_row(new_board, symbol) or 
-            self.__compare_with_movements_bottom_row(new_board, symbol) or 
-            self.__compare_with_movements_right_col(new_board, symbol) or 
-            self.__compare_with_movements_left_col(new_board, symbol))
-
-    def __play_turn(self, player):
-        print("Player", player.name, "turn!")
+    # The submitted board is legal if it is one of the boards reachable
+    # from self.board with one move. Returns that move, or None.
+    def __validate_move(self, new_board, symbol):
+        submitted = board_masks(new_board)
+        if submitted is None:
+            return None
+        current = BitBoard.from_list(self.board)
+        return find_move(current.x, current.o, submitted[0], submitted[1], symbol)
+
+    def __in_process(self, player, symbol):
+        if isinstance(player, PlayerProcess):
+            return player
+        if not isinstance(player, tuple):
+            raise TypeError("processes=True needs (module:Class, options) specs or PlayerProcess players")
+        process = PlayerProcess(player, symbol)
+        self.own_processes.append(process)
+        return process
+
+    def close(self):
+        for process in self.own_processes:
+            process.close()
+        self.own_processes = []
+
+    # Runs play_turn in a thread; returns None if it did not finish in
+    # time (the thread cannot be stopped and keeps running).
+    def __thread_turn(self, player):
         result_queue = queue.Queue()
 
         def play_turn_with_timeout():
@@ -254,31 +132,67 @@ class QuixoReferee:
 
         turn_thread = threading.Thread(target=play_turn_with_timeout)
         turn_thread.start()
-        turn_thread.join(timeout=1)
+        turn_thread.join(timeout=self.move_timeout)
+        return None if result_queue.empty() else result_queue.get()
+
+    # Asks a worker process for a move id; returns None if it missed the
+    # deadline (the worker has then been killed and restarted).
+    def __process_turn(self, player):
+        current = BitBoard.from_list(self.board)
+        kind, value = player.request_move(current.x, current.o, self.move_timeout)
+        if kind == 'timeout':
+            return None
+        if kind == 'move':
+            return current.apply(value, player.symbol).to_list()
+        # An illegal or malformed board, rejected by __validate_move.
+        return value if value is not None else []
 
-        if not result_queue.empty():
-            new_board = result_queue.get()
-            if self.__is_valid_move(new_board, player.symbol):
+    def __play_turn(self, player):
+        self.__log("Player", player.name, "turn!")
+        if isinstance(player, PlayerProcess):
+            new_board = self.__process_turn(player)
+        else:
+            new_board = self.__thread_turn(player)
+
+        if new_board is not None:
+            self.last_move = self.__validate_move(new_board, player.symbol)
+            if self.last_move is not None:
+                if self.records is not None:
+                    current = BitBoard.from_list(self.board)
+                    self.records.add_move(current.x, current.o, self.last_move, player.symbol,
+                                          getattr(player, 'last_value', None), getattr(player, 'last_depth', None))
+                self.board = new_board
+                stats = getattr(player, 'last_stats', None)
+                if self.collect_stats and stats is not None:
+                    self.search_stats[player.symbol].append(stats)
                 winning_pos, winning_sym = self.__is_winning_position(new_board, player.symbol)
                 if winning_pos:
-                    print("Symbol ", winning_sym, "wins!")
+                    self.__log("Symbol ", winning_sym, "wins!")
                     self.__print_board(self.board)
+                    self.last_reason = 'win'
                     return True, winning_sym
             else:
-                print("Player", player.name, "made an illegal move. Loses automatically!")
+                self.__log("Player", player.name, "made an illegal move. Loses automatically!")
                 self.__print_board(new_board)
+                self.illegal_moves[player.symbol] += 1
+                self.last_reason = 'illegal'
                 return True, (player.symbol * -1)
         else:
-            print("Player", player.name, "took too long to move. Loses automatically!")
+            self.__log("Player", player.name, "took too long to move. Loses automatically!")
+            self.timeouts[player.symbol] += 1
 
         return False, 0
 
     def play_game(self, limit_turns):
         self.board = [[0] * 5 for _ in range(5)]
+        self.last_reason = None
+        self.timeouts = defaultdict(int)
+        self.illegal_moves = defaultdict(int)
+        self.search_stats = defaultdict(list)
 
         for i in range(2 * limit_turns):
             if i % 2 == 0:
-                print('------------', (i + 2) // 2, ' TURN ------------')
+                self.__log('------------', (i + 2) // 2, ' TURN ------------')
                 wins, sym = self.__play_turn(self.player1)
             else:
                 wins, sym = self.__play_turn(self.player2)
@@ -286,9 +200,14 @@ class QuixoReferee:
             if wins:
                 # if sym == 1:
                     # self.losing_boards.append(copy.deepcopy(self.board))
+                if self.records is not None:
+                    self.records.end_game(sym)
                 return sym
         
-        print("Limit of turns reached. Game ends in a draw.")
+        self.__log("Limit of turns reached. Game ends in a draw.")
+        self.last_reason = 'draw'
+        if self.records is not None:
+            self.records.end_game(0)
         return 0
     
     # Receives the number of games to play per match and
@@ -298,40 +217,42 @@ class QuixoReferee:
         symbol_p1 = -1
         symbol_p2 = 1       
         for i in range(limit_games):
-            print("----------- STARTING GAME ", i + 1, "-----------")
+            self.__log("----------- STARTING GAME ", i + 1, "-----------")
             symbol_p1, symbol_p2 = symbol_p2, symbol_p1
 
             self.player1.reset(symbol_p1)
             self.player2.reset(symbol_p2)
 
-            print(self.player1.name, 'with symbol', symbol_p1)
-            print(self.player2.name, 'with symbol', symbol_p2) 
+            self.__log(self.player1.name, 'with symbol', symbol_p1)
+            self.__log(self.player2.name, 'with symbol', symbol_p2) 
 
             winner = self.play_game(limit_turns)
 
             if self.player1.symbol == winner:
-                print(self.player1.name, "WINS!")
+                self.__log(self.player1.name, "WINS!")
                 score[self.player1.name] += 1
                 self.losing_boards.append(copy.deepcopy(self.board))
             elif self.player2.symbol == winner:
-                print(self.player2.name, "WINS!")
+                self.__log(self.player2.name, "WINS!")
                 score[self.player2.name] += 1
             else:
                 score[self.player1.name] += 0.5
                 score[self.player2.name] += 0.5
 
-        print("MATCH RESULTS!")
-        print(limit_games, "GAMES PLAYED!")
-        print(self.player1.name, " vs ", self.player2.name)
-        print(self.player1.name, ":", score[self.player1.name])
-        print(self.player2.name, ":", score[self.player2.name])
-        if (score[self.player1.name] > score[self.player2.name]): print(self.player1.name, "WINS!")
-        elif (score[self.player1.name] < score[self.player2.name]): print(self.player2.name, "WINS!")
-        else: print("IT'S A DRAW!") 
+        self.__log("MATCH RESULTS!")
+        self.__log(limit_games, "GAMES PLAYED!")
+        self.__log(self.player1.name, " vs ", self.player2.name)
+        self.__log(self.player1.name, ":", score[self.player1.name])
+        self.__log(self.player2.name, ":", score[self.player2.name])
+        if (score[self.player1.name] > score[self.player2.name]): self.__log(self.player1.name, "WINS!")
+        elif (score[self.player1.name] < score[self.player2.name]): self.__log(self.player2.name, "WINS!")
+        else: self.__log("IT'S A DRAW!") 
 
         self.__print_losing_boards()  # Imprime los tableros al final de todas las partidas
 
     def __print_board(self, board):
+        if not self.verbose:
+            return
         if board is None:
             board = self.board
         headers = [""] + [str(i) for i in range(1, 6)]
@@ -339,13 +260,14 @@ class QuixoReferee:
         print(tabulate(rows, headers=headers, tablefmt="grid"))
     
     def __print_losing_boards(self):
-        print("\nTableros donde kuri bot (bot2) perdió:")
+        self.__log("\nTableros donde kuri bot (bot2) perdió:")
         for idx, board in enumerate(self.losing_boards, 1):
-            print(f"\nTablero {idx}:")
+            self.__log(f"\nTablero {idx}:")
             self.__print_board(board)
 
-bot1 = qr.QuixoRandomBot(1)
-bot2 = qb.QuixoBot(-1)
+if __name__ == "__main__":
+    bot1 = qr.QuixoRandomBot(1)
+    bot2 = qb.QuixoBot(-1)
 
-referee = QuixoReferee(bot1, bot2)
-referee.play_match(20, 100)
\ No newline at end of file
+    referee = QuixoReferee(bot1, bot2)
+    referee.play_match(20, 100)
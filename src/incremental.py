@@ -0,0 +1,65 @@
+"""
+    Incremental line evaluation.
+
+    A move only changes the row or column it slides along, so instead of
+    rescanning the 12 lines at every leaf the evaluator keeps the piece
+    counts of each line and only recounts the lines crossed by the move.
+"""
+
+from lines import LINE_MASKS, MOVE_TABLE, line_counts
+
+# (index, mask) of the lines in the affected-line mask of MOVE_TABLE, the
+# only ones whose counts a move can change.
+MOVE_LINES = [[(i, line) for i, line in enumerate(LINE_MASKS) if affected >> i & 1] for _, _, affected in MOVE_TABLE]
+
+
+class IncrementalEvaluator:
+    # line_scores[x_count][o_count] is the score of one line from X's
+    # point of view.
+    def __init__(self, line_scores):
+        self.line_scores = line_scores
+        self.x_counts = [0] * len(LINE_MASKS)
+        self.o_counts = [0] * len(LINE_MASKS)
+        self.score = 0
+        self.history = []
+
+    def reset(self, x, o):
+        self.score = 0
+        self.history = []
+        for i, (x_count, o_count) in enumerate(line_counts(x, o)):
+            self.x_counts[i] = x_count
+            self.o_counts[i] = o_count
+            self.score += self.line_scores[x_count][o_count]
+
+    # Called with the board after the move has been applied. Returns the
+    # change in score (X's point of view).
+    def make(self, x, o, move):
+        x_counts = self.x_counts
+        o_counts = self.o_counts
+        scores = self.line_scores
+        changed = []
+        delta = 0
+        for i, line in MOVE_LINES[move]:
+            x_count = (x & line).bit_count()
+            o_count = (o & line).bit_count()
+            old_x = x_counts[i]
+            old_o = o_counts[i]
+            if x_count != old_x or o_count != old_o:
+                changed.append((i, old_x, old_o))
+                delta += scores[x_count][o_count] - scores[old_x][old_o]
+                x_counts[i] = x_count
+                o_counts[i] = o_count
+        self.history.append((changed, delta))
+        self.score += delta
+        return delta
+
+    def unmake(self):
+        changed, delta = self.history.pop()
+        for i, old_x, old_o in changed:
+            self.x_counts[i] = old_x
+            self.o_counts[i] = old_o
+        self.score -= delta
+
+    def score_for(self, symbol):
+        return self.score if symbol == 1 else -self.score
+
@@ -0,0 +1,155 @@
+"""
+    Search instrumentation.
+
+    InstrumentedSearch is an AlphaBetaSearch that also counts leaves,
+    the nodes of every finished depth and the time spent generating,
+    ordering and evaluating. QuixoBot only builds it with
+    instrument=True, so the plain search pays nothing for it.
+    Transposition table and cutoff counters are read as differences of
+    the counters the table and the move orderer keep anyway.
+
+    Every move gives one flat dict (SearchStats.to_dict) that can be
+    written as a JSON line; summarize merges the dicts of a game.
+"""
+
+import json
+import time
+
+from search import AlphaBetaSearch
+
+PHASES = ('generation', 'ordering', 'evaluation')
+
+
+class SearchStats:
+    def __init__(self):
+        self.nodes = 0
+        self.leaves = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.cutoffs = []
+        self.depth = 0
+        # Nodes searched by the end of each finished depth.
+        self.depth_nodes = []
+        self.phase_time = dict.fromkeys(PHASES, 0.0)
+        self.elapsed = 0.0
+
+    # Growth of the tree from one finished depth to the next, or the
+    # depth-th root of the node count with only one depth.
+    def branching_factor(self):
+        counts = [b - a for a, b in zip([0] + self.depth_nodes, self.depth_nodes)]
+        if len(counts) >= 2 and counts[-2] > 0:
+            return counts[-1] / counts[-2]
+        if self.depth > 0 and self.nodes > 0:
+            return self.nodes ** (1 / self.depth)
+        return 0.0
+
+    def to_dict(self):
+        cutoffs = sum(self.cutoffs)
+        return {
+            'nodes': self.nodes,
+            'leaves': self.leaves,
+            'depth': self.depth,
+            'elapsed': self.elapsed,
+            'nps': self.nodes / self.elapsed if self.elapsed else 0.0,
+            'branching_factor': self.branching_factor(),
+            'tt_probes': self.tt_probes,
+            'tt_hits': self.tt_hits,
+            'cutoffs': cutoffs,
+            'first_move_cutoff_rate': self.cutoffs[0] / cutoffs if cutoffs else 0.0,
+            'cutoffs_by_index': self.cutoffs,
+            'phase_time': dict(self.phase_time),
+        }
+
+
+class InstrumentedSearch(AlphaBetaSearch):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = SearchStats()
+        self.started = None
+
+    # Starts the counters of a new move.
+    def begin(self):
+        self.stats = SearchStats()
+        tt = self.tt
+        self.started = (time.perf_counter(), tt.hits if tt else 0, tt.hits + tt.misses if tt else 0,
+                        list(self.orderer.cutoff_indices))
+
+    # Closes the counters of the move and returns them as a dict.
+    def finish(self, depth, nodes):
+        start, hits, probes, cutoffs = self.started
+        stats = self.stats
+        stats.elapsed = time.perf_counter() - start
+        stats.depth = depth
+        stats.nodes = nodes
+        if self.tt is not None:
+            stats.tt_hits = self.tt.hits - hits
+            stats.tt_probes = self.tt.hits + self.tt.misses - probes
+        counts = [now - before for now, before in zip(self.orderer.cutoff_indices, cutoffs)]
+        while counts and counts[-1] == 0:
+            counts.pop()
+        stats.cutoffs = counts
+        return stats.to_dict()
+
+    def search(self, board, depth, first_move=None, root_moves=None, shared_alpha=None):
+        result = super().search(board, depth, first_move, root_moves, shared_alpha)
+        self.stats.depth_nodes.append(self.nodes)
+        return result
+
+    def make(self, move, symbol):
+        self.count_nodes(1)
+        self.board.make(move, symbol)
+        start = time.perf_counter()
+        self.evaluator.make(self.board.x, self.board.o, move)
+        self.stats.phase_time['evaluation'] += time.perf_counter() - start
+
+    def is_leaf(self, depth):
+        start = time.perf_counter()
+        leaf = super().is_leaf(depth)
+        self.stats.phase_time['evaluation'] += time.perf_counter() - start
+        if leaf:
+            self.stats.leaves += 1
+        return leaf
+
+    def ordered_moves(self, symbol, tt_move, ply):
+        board = self.board
+        phase_time = self.stats.phase_time
+        start = time.perf_counter()
+        moves, count = self.generate_moves(symbol, ply)
+        generated = time.perf_counter()
+        self.orderer.order(moves, board.x, board.o, symbol, self.evaluator.x_counts, self.evaluator.o_counts,
+                           ply, tt_move, count)
+        phase_time['generation'] += generated - start
+        phase_time['ordering'] += time.perf_counter() - generated
+        return moves, count
+
+    def frontier_value(self, key, t, symbol, pick, ply):
+        nodes = self.nodes
+        start = time.perf_counter()
+        value = super().frontier_value(key, t, symbol, pick, ply)
+        self.stats.phase_time['evaluation'] += time.perf_counter() - start
+        self.stats.leaves += self.nodes - nodes
+        return value
+
+
+def write_json_line(path, record):
+    with open(path, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+
+
+# Totals and averages over the per-move dicts of one game or more.
+def summarize(records):
+    moves = len(records)
+    nodes = sum(record['nodes'] for record in records)
+    elapsed = sum(record['elapsed'] for record in records)
+    cutoffs = sum(record.get('cutoffs', 0) for record in records)
+    first = sum(record['cutoffs_by_index'][0] for record in records if record.get('cutoffs_by_index'))
+    return {
+        'moves': moves,
+        'nodes': nodes,
+        'elapsed': elapsed,
+        'nps': nodes / elapsed if elapsed else 0.0,
+        'avg_depth': sum(record['depth'] for record in records) / moves if moves else 0.0,
+        'avg_branching_factor': (sum(record.get('branching_factor', 0.0) for record in records) / moves
+                                 if moves else 0.0),
+        'first_move_cutoff_rate': first / cutoffs if cutoffs else 0.0,
+    }
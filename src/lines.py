@@ -0,0 +1,56 @@
+"""
+    The 12 winning lines of the board as BitBoard masks, precomputed once.
+"""
+
+from bitboard import ALL_MOVES, DIRECTIONS, MOVE_DIRECTION, MOVE_SPAN, MOVE_SRC, SIZE, cell_bit
+
+ROW_MASKS = [sum(cell_bit(row, col) for col in range(SIZE)) for row in range(SIZE)]
+COL_MASKS = [sum(cell_bit(row, col) for row in range(SIZE)) for col in range(SIZE)]
+DIAG_MASK = sum(cell_bit(i, i) for i in range(SIZE))
+ANTI_DIAG_MASK = sum(cell_bit(i, SIZE - 1 - i) for i in range(SIZE))
+
+LINE_MASKS = ROW_MASKS + COL_MASKS + [DIAG_MASK, ANTI_DIAG_MASK]
+NUM_LINES = len(LINE_MASKS)
+
+# Indices of the lines that go through each cell.
+CELL_LINES = [[i for i, line in enumerate(LINE_MASKS) if line & (1 << cell)] for cell in range(SIZE * SIZE)]
+
+# MOVE_TABLE[move] = (source cell, direction index, affected lines): the
+# lines a move can change, as a mask with bit i set for LINE_MASKS[i].
+MOVE_TABLE = [(MOVE_SRC[m].bit_length() - 1, DIRECTIONS.index(MOVE_DIRECTION[m]),
+               sum(1 << i for i, line in enumerate(LINE_MASKS) if line & MOVE_SPAN[m]))
+              for m in ALL_MOVES]
+
+_ROW_STARTS = COL_MASKS[0]
+
+
+def has_five(mask):
+    # A full row leaves its first cell set after and-ing the four shifted
+    # copies; a full column does the same with shifts of a whole row.
+    if mask & (mask >> 1) & (mask >> 2) & (mask >> 3) & (mask >> 4) & _ROW_STARTS:
+        return True
+    if mask & (mask >> 5) & (mask >> 10) & (mask >> 15) & (mask >> 20):
+        return True
+    return (mask & DIAG_MASK) == DIAG_MASK or (mask & ANTI_DIAG_MASK) == ANTI_DIAG_MASK
+
+
+def five_in_a_row(x, o):
+    return has_five(x), has_five(o)
+
+
+def winner(x, o, symbol):
+    # Same rule as the referee: if both players have five in a row after
+    # a move, the player that is not moving (-symbol) wins.
+    x_five = has_five(x)
+    o_five = has_five(o)
+    if x_five and o_five:
+        return True, symbol * -1
+    elif x_five:
+        return True, 1
+    elif o_five:
+        return True, -1
+    return False, 0
+
+
+def line_counts(x, o):
+    return [((x & line).bit_count(), (o & line).bit_count()) for line in LINE_MASKS]
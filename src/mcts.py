@@ -0,0 +1,228 @@
+"""
+    Monte Carlo tree search (UCT) player.
+
+    Nodes live in parallel lists indexed by node number instead of one
+    object per node. The children of a node are allocated together when
+    it is expanded, so a node only records where its block of children
+    starts and how long it is. Positions are bit masks, and playouts use
+    the random bot's move generator on the same masks.
+
+    After every move the subtree of the position reached is kept. On the
+    next turn the tree is re-rooted at the opponent's reply and copied
+    into fresh lists, so the tree keeps only positions that can still
+    happen.
+
+    python tournament.py mcts:MCTSBot quixo_bot:QuixoBot --options-a '{"time_budget": 0.5}' \\
+        --options-b '{"time_budget": 0.5}'
+"""
+
+import math
+import time
+
+from tabulate import tabulate
+
+from bitboard import NUM_MOVES, BitBoard, apply_move, generate_moves_into
+from lines import winner
+from quixo_random import random_playout
+
+# Iterations between two clock reads.
+CHECK_INTERVAL = 16
+
+
+class MCTSBot:
+    # time_budget - safety_margin seconds of search per move, or a fixed
+    # number of iterations when time_budget is None. Playouts stop as a
+    # draw after max_playout_plies. The tree stops growing at max_nodes
+    # nodes; playouts still run from its leaves.
+    def __init__(self, symbol, time_budget=1.0, safety_margin=0.2, iterations=1000, exploration=1.4,
+                 max_playout_plies=100, max_nodes=1000000):
+        self.symbol = symbol
+        self.opponent_symbol = 1 if symbol == -1 else -1
+        self.board = [[0] * 5 for _ in range(5)]
+        self.name = "Kuri Bot MCTS"
+        self.time_budget = time_budget
+        self.safety_margin = safety_margin
+        self.iterations = iterations
+        self.exploration = exploration
+        self.max_playout_plies = max_playout_plies
+        self.max_nodes = max_nodes
+        self.last_iterations = 0
+        self.last_tree_size = 0
+        self.moves = [0] * NUM_MOVES
+        self.clear()
+
+    # Node n: position (x[n], o[n]) with to_move[n] to play, reached by
+    # move[n] from parent[n]. Its children are first_child[n] ..
+    # first_child[n] + num_children[n] - 1 (num_children is -1 until
+    # expanded). terminal[n] is the winning symbol of a finished game,
+    # else 0. score[n] counts wins (draws as 0.5) of the player who moved
+    # into n.
+    def clear(self):
+        self.x = []
+        self.o = []
+        self.to_move = []
+        self.parent = []
+        self.move = []
+        self.first_child = []
+        self.num_children = []
+        self.terminal = []
+        self.visits = []
+        self.score = []
+        self.root = None
+
+    def add_node(self, x, o, to_move, parent, move, terminal):
+        self.x.append(x)
+        self.o.append(o)
+        self.to_move.append(to_move)
+        self.parent.append(parent)
+        self.move.append(move)
+        self.first_child.append(0)
+        self.num_children.append(-1)
+        self.terminal.append(terminal)
+        self.visits.append(0)
+        self.score.append(0.0)
+        return len(self.x) - 1
+
+    def expand(self, node):
+        x, o, symbol = self.x[node], self.o[node], self.to_move[node]
+        moves = self.moves
+        count = generate_moves_into(x, o, symbol, moves)
+        self.first_child[node] = len(self.x)
+        self.num_children[node] = count
+        for move in moves[:count]:
+            child_x, child_o = apply_move(x, o, move, symbol)
+            over, winning_symbol = winner(child_x, child_o, symbol)
+            self.add_node(child_x, child_o, -symbol, node, move, winning_symbol if over else 0)
+
+    def select_child(self, node):
+        first = self.first_child[node]
+        visits = self.visits
+        score = self.score
+        log_parent = math.log(visits[node] or 1)
+        exploration = self.exploration
+        best = first
+        best_value = -1.0
+        for child in range(first, first + self.num_children[node]):
+            n = visits[child]
+            if n == 0:
+                return child
+            value = score[child] / n + exploration * math.sqrt(log_parent / n)
+            if value > best_value:
+                best_value = value
+                best = child
+        return best
+
+    # One selection, expansion, playout and backup.
+    def iterate(self):
+        node = self.root
+        while self.num_children[node] > 0 and not self.terminal[node]:
+            node = self.select_child(node)
+        result = self.terminal[node]
+        if not result:
+            if self.num_children[node] < 0 and len(self.x) < self.max_nodes:
+                self.expand(node)
+                if self.num_children[node] > 0:
+                    node = self.select_child(node)
+                    result = self.terminal[node]
+            if not result:
+                result = random_playout(self.x[node], self.o[node], self.to_move[node], self.max_playout_plies)
+        while node is not None:
+            self.visits[node] += 1
+            mover = -self.to_move[node]
+            if result == mover:
+                self.score[node] += 1.0
+            elif result == 0:
+                self.score[node] += 0.5
+            node = self.parent[node]
+
+    # Copies the subtree under node into fresh lists, so the new root is
+    # node 0 and children blocks stay contiguous.
+    def reroot(self, node):
+        old = (self.x, self.o, self.to_move, self.move, self.first_child, self.num_children, self.terminal,
+               self.visits, self.score)
+        old_x, old_o, old_to_move, old_move, old_first, old_count, old_terminal, old_visits, old_score = old
+        self.clear()
+        self.root = self.add_node(old_x[node], old_o[node], old_to_move[node], None, old_move[node],
+                                  old_terminal[node])
+        queue = [(node, self.root)]
+        for old_node, new_node in queue:
+            self.visits[new_node] = old_visits[old_node]
+            self.score[new_node] = old_score[old_node]
+            count = old_count[old_node]
+            if count < 0:
+                continue
+            self.first_child[new_node] = len(self.x)
+            self.num_children[new_node] = count
+            first = old_first[old_node]
+            for old_child in range(first, first + count):
+                new_child = self.add_node(old_x[old_child], old_o[old_child], old_to_move[old_child], new_node,
+                                          old_move[old_child], old_terminal[old_child])
+                queue.append((old_child, new_child))
+
+    # Finds the position among the root and the two plies below it, which
+    # covers our last move and the opponent's reply.
+    def find_node(self, x, o):
+        if self.root is None:
+            return None
+        frontier = [self.root]
+        for _ in range(3):
+            next_frontier = []
+            for node in frontier:
+                if self.x[node] == x and self.o[node] == o and self.to_move[node] == self.symbol:
+                    return node
+                if self.num_children[node] > 0:
+                    first = self.first_child[node]
+                    next_frontier.extend(range(first, first + self.num_children[node]))
+            frontier = next_frontier
+        return None
+
+    def play_turn(self, board):
+        start = time.perf_counter()
+        bit_board = BitBoard.from_list(board)
+        node = self.find_node(bit_board.x, bit_board.o)
+        if node is None:
+            self.clear()
+            self.root = self.add_node(bit_board.x, bit_board.o, self.symbol, None, None, 0)
+        else:
+            self.reroot(node)
+        if self.time_budget is not None:
+            deadline = start + self.time_budget - self.safety_margin
+            iterations = 0
+            while True:
+                for _ in range(CHECK_INTERVAL):
+                    self.iterate()
+                iterations += CHECK_INTERVAL
+                if time.perf_counter() >= deadline:
+                    break
+        else:
+            iterations = self.iterations
+            for _ in range(iterations):
+                self.iterate()
+        self.last_iterations = iterations
+        self.last_tree_size = len(self.x)
+        move = self.best_move()
+        if move is not None:
+            board[:] = bit_board.apply(move, self.symbol).to_list()
+        return board
+
+    # Most visited root move.
+    def best_move(self):
+        root = self.root
+        if self.num_children[root] <= 0:
+            return None
+        first = self.first_child[root]
+        best = max(range(first, first + self.num_children[root]), key=self.visits.__getitem__)
+        return self.move[best]
+
+    def print_board(self, board=None):
+        if board is None:
+            board = self.board
+        headers = [""] + [str(i) for i in range(1, 6)]
+        rows = [[str(i + 1)] + ['O' if cell == -1 else 'X' if cell == 1 else ' ' for cell in row] for i, row in enumerate(board)]
+        print(tabulate(rows, headers=headers, tablefmt="grid"))
+
+    def reset(self, symbol):
+        self.symbol = symbol
+        self.opponent_symbol = 1 if symbol == -1 else -1
+        self.board = [[0] * 5 for _ in range(5)]
+        self.clear()
@@ -0,0 +1,103 @@
+"""
+    Move ordering without touching the board.
+
+    Moves are scored from tables only: the transposition table move
+    first, then the killer moves of the ply, then the history heuristic
+    plus a threat bonus read from the evaluator's line counts.
+"""
+
+from itertools import islice
+
+from bitboard import ALL_MOVES, MOVE_DEST, MOVE_SRC, NUM_MOVES
+from lines import CELL_LINES
+
+TT_MOVE_BONUS = 1 << 30
+KILLER_BONUS = 1 << 20
+# Bonus for the mover's piece landing on a line that already holds
+# 0..4 of its pieces, and for landing on a line where the opponent has
+# 0..4 pieces (which breaks that line).
+THREAT_BONUS = [0, 1, 4, 16, 256, 0]
+BLOCK_BONUS = [0, 0, 2, 8, 128, 0]
+# Picking an empty cube adds a piece to the board.
+NEW_PIECE_BONUS = 2
+MAX_PLY = 64
+
+MOVE_DEST_LINES = [CELL_LINES[MOVE_DEST[m].bit_length() - 1] for m in ALL_MOVES]
+
+
+# A move is quiet when its piece lands on no line where either side
+# already has three or more pieces: it neither builds nor blocks a
+# threat, so late-move reductions may search it shallower.
+def is_quiet(move, x_counts, o_counts):
+    for i in MOVE_DEST_LINES[move]:
+        if x_counts[i] >= 3 or o_counts[i] >= 3:
+            return False
+    return True
+
+
+class MoveOrderer:
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        # history[side][move]; a move id stands for a (cell, direction) pair.
+        self.history = [[0] * NUM_MOVES, [0] * NUM_MOVES]
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        # Cutoffs by the index of the move that caused them.
+        self.cutoff_indices = [0] * NUM_MOVES
+
+    # Called once per turn: old history still helps but should not
+    # outweigh what the new search finds.
+    def new_search(self):
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        for table in self.history:
+            for move in ALL_MOVES:
+                table[move] >>= 1
+
+    # Scores of the first count moves (all of them when count is None).
+    def threat_scores(self, moves, x, o, symbol, x_counts, o_counts, count=None):
+        own_counts, opp_counts = (x_counts, o_counts) if symbol == 1 else (o_counts, x_counts)
+        empty = ~(x | o)
+        scores = {}
+        for move in moves if count is None else islice(moves, count):
+            score = NEW_PIECE_BONUS if empty & MOVE_SRC[move] else 0
+            for i in MOVE_DEST_LINES[move]:
+                score += THREAT_BONUS[own_counts[i]] + BLOCK_BONUS[opp_counts[i]]
+            scores[move] = score
+        return scores
+
+    # Sorts the first count moves (all of them when count is None) best
+    # first, in place.
+    def order(self, moves, x, o, symbol, x_counts, o_counts, ply=None, tt_move=None, count=None):
+        scores = self.threat_scores(moves, x, o, symbol, x_counts, o_counts, count)
+        history = self.history[0 if symbol == 1 else 1]
+        for move in scores:
+            scores[move] += history[move]
+        if ply is not None and ply < MAX_PLY:
+            for killer in self.killers[ply]:
+                if killer in scores:
+                    scores[killer] += KILLER_BONUS
+        if tt_move in scores:
+            scores[tt_move] += TT_MOVE_BONUS
+        if count is None or count == len(moves):
+            moves.sort(key=scores.__getitem__, reverse=True)
+        else:
+            moves[:count] = sorted(scores, key=scores.__getitem__, reverse=True)
+        return moves
+
+    def cutoff(self, move, index, ply, depth, symbol):
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+        self.cutoff_indices[index] += 1
+        self.history[0 if symbol == 1 else 1][move] += depth * depth
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+
+    def first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
@@ -0,0 +1,135 @@
+"""
+    Root-splitting parallel search over a process pool.
+
+    The root moves are dealt round-robin to the workers of a
+    ProcessPoolExecutor that is started once and reused across turns.
+    Each worker runs iterative deepening on its share of the moves and
+    publishes the best value it has proven at every depth, so the other
+    workers can use it as their alpha. Boards travel as the two integer
+    masks, and the deadline as an absolute perf_counter time (the
+    system-wide monotonic clock), so time spent before a worker picks up
+    its share still counts against the move.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from bitboard import BitBoard
+from ordering import MAX_PLY
+
+_shared_alpha = None
+_bots = {}
+
+
+class SharedAlpha:
+    def __init__(self, values):
+        self.values = values
+
+    def get(self, depth):
+        return self.values[depth]
+
+    def raise_to(self, depth, value):
+        with self.values.get_lock():
+            if value > self.values[depth]:
+                self.values[depth] = value
+
+    def reset(self):
+        with self.values.get_lock():
+            for depth in range(len(self.values)):
+                self.values[depth] = float('-inf')
+
+
+def _init_worker(values):
+    global _shared_alpha
+    _shared_alpha = SharedAlpha(values)
+
+
+# Pays for starting the worker and importing the bot before the first
+# move instead of during it.
+def _warm_up():
+    import quixo_bot  # noqa: F401
+    return True
+
+
+# Runs in a worker. Each worker keeps one bot per symbol, so its
+# transposition table and history survive between turns of the same
+# game.
+def _search_root_moves(x, o, symbol, moves, deadline, max_depth, game, bot_options):
+    from quixo_bot import QuixoBot
+
+    bot_game, bot = _bots.get(symbol, (None, None))
+    if bot is None or bot_game != game:
+        bot = QuixoBot(symbol, **bot_options)
+        _bots[symbol] = (game, bot)
+    if bot.tt is not None:
+        bot.tt.new_search()
+    bot.orderer.new_search()
+    searcher = bot.searcher
+    # iterative_deepening stops at MAX_PLY, the last depth with a shared
+    # alpha.
+    searcher.iterative_deepening(BitBoard(x, o), deadline, max_depth, set(moves), _shared_alpha)
+    return searcher.completed, searcher.nodes
+
+
+class ParallelSearch:
+    # bot_options are passed to the QuixoBot built in each worker
+    # (tt_size_mb, symmetry...).
+    def __init__(self, workers, bot_options=None):
+        self.workers = workers
+        self.bot_options = bot_options or {}
+        self.executor = None
+        self.values = None
+        self.game = 0
+        self.nodes = 0
+        self.depth_reached = 0
+        # Root value of the last search, from the mover's point of view.
+        self.value = None
+
+    def start(self):
+        if self.executor is not None:
+            return
+        self.values = multiprocessing.Array('d', [float('-inf')] * (MAX_PLY + 1))
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                            initargs=(self.values,))
+        wait([self.executor.submit(_warm_up) for _ in range(self.workers)])
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    # Tells the workers to drop their tables before the next search.
+    def new_game(self):
+        self.game += 1
+
+    # deadline is a time.perf_counter() value.
+    def search(self, board, symbol, deadline, max_depth=None):
+        self.start()
+        SharedAlpha(self.values).reset()
+        self.value = None
+        moves = board.generate_moves(symbol)
+        if not moves:
+            return None
+        shares = [moves[i::self.workers] for i in range(self.workers)]
+        futures = [self.executor.submit(_search_root_moves, board.x, board.o, symbol, share, deadline,
+                                        max_depth, self.game, self.bot_options)
+                   for share in shares if share]
+        results = [future.result() for future in futures]
+        self.nodes = sum(nodes for _, nodes in results)
+        # Only depths every worker finished can be compared.
+        self.depth_reached = min(len(completed) for completed, _ in results)
+        if self.depth_reached == 0:
+            return moves[0]
+        best_move = None
+        best_key = None
+        for completed, _ in results:
+            move, value, exact = completed[self.depth_reached - 1]
+            if move is None:
+                continue
+            key = (value, exact)
+            if best_key is None or key > best_key:
+                best_key = key
+                best_move = move
+        if best_key is not None:
+            self.value = best_key[0]
+        return best_move
@@ -0,0 +1,159 @@
+"""
+    Players in long-lived worker processes, for the referee.
+
+    PlayerProcess runs a player in its own process and talks to it over
+    a pipe. The player is built inside the worker from its (module:Class,
+    options) spec, so a player that starts processes of its own (a
+    QuixoBot with workers or ponder) starts them there. The parent sends
+    the board as the two bit masks and gets a move id back. The deadline
+    of every move is enforced by the parent: a worker that does not
+    answer in time is killed, with any processes it started, and
+    replaced by a fresh player, so a slow move cannot keep running and
+    slow down the rest of the match.
+"""
+
+import importlib
+import multiprocessing
+import os
+import random
+import signal
+
+from bitboard import BitBoard, board_masks, find_move
+
+# Seconds a new worker gets to start before its first move.
+START_TIMEOUT = 30
+
+
+def load_player(spec, symbol):
+    # spec is (module:Class, keyword options)
+    path, options = spec
+    module_name, class_name = path.split(':')
+    player_class = getattr(importlib.import_module(module_name), class_name)
+    return player_class(symbol, **options)
+
+
+def _run_player(conn, spec, symbol):
+    # Its own process group, so that kill() also takes down the processes
+    # the player started.
+    if hasattr(os, 'setpgid'):
+        os.setpgid(0, 0)
+    player = load_player(spec, symbol)
+    conn.send(('ready', getattr(player, 'name', spec[0])))
+    while True:
+        message = conn.recv()
+        if message[0] == 'close':
+            close = getattr(player, 'close', None)
+            if close is not None:
+                close()
+            break
+        if message[0] == 'reset':
+            _, symbol, seed = message
+            if seed is not None:
+                random.seed(seed)
+            player.reset(symbol)
+            continue
+        _, x, o = message
+        new_board = player.play_turn(BitBoard(x, o).to_list())
+        info = (getattr(player, 'last_stats', None), getattr(player, 'last_value', None),
+                getattr(player, 'last_depth', None))
+        submitted = board_masks(new_board)
+        move = find_move(x, o, submitted[0], submitted[1], player.symbol) if submitted is not None else None
+        if move is not None:
+            conn.send(('move', move) + info)
+        else:
+            # Not a legal move: send the board so the referee can show it.
+            conn.send(('board', new_board if submitted is not None else None) + info)
+
+
+class PlayerProcess:
+    # spec is (module:Class, keyword options); every start builds a new
+    # player from it in the worker. Workers are not daemonic, so that the
+    # player can start processes of its own: close() must be called.
+    def __init__(self, spec, symbol):
+        self.spec = spec
+        self.symbol = symbol
+        self.name = None
+        # What the player reported about its last move, if anything.
+        self.last_stats = None
+        self.last_value = None
+        self.last_depth = None
+        self.restarts = 0
+        # Seed of the worker's random module for the current game; a
+        # restarted worker is seeded again with it.
+        self.seed = None
+        self.conn = None
+        self.process = None
+        self.start()
+
+    def start(self):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_run_player, args=(child_conn, self.spec, self.symbol))
+        self.process.start()
+        child_conn.close()
+        if not self.conn.poll(START_TIMEOUT):
+            self.kill()
+            raise RuntimeError("player %s did not start" % self.spec[0])
+        _, self.name = self.conn.recv()
+        self.conn.send(('reset', self.symbol, self.seed))
+
+    def kill(self):
+        if hasattr(os, 'killpg'):
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        else:
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def restart(self):
+        self.kill()
+        self.restarts += 1
+        self.start()
+
+    def close(self):
+        if self.process is None:
+            return
+        try:
+            self.conn.send(('close',))
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(START_TIMEOUT)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+        self.process = None
+
+    # The worker has its own random module: seed makes its games repeat.
+    def reset(self, symbol, seed=None):
+        self.symbol = symbol
+        self.seed = seed
+        self.conn.send(('reset', symbol, seed))
+
+    # Returns ('move', move id), ('board', submitted 5x5 board) for a
+    # board no legal move reaches, or ('timeout', None) when the worker
+    # missed the deadline or died; in that case it has been restarted.
+    def request_move(self, x, o, timeout):
+        self.conn.send(('play', x, o))
+        try:
+            if self.conn.poll(timeout):
+                kind, value, self.last_stats, self.last_value, self.last_depth = self.conn.recv()
+                return kind, value
+        except (EOFError, OSError):
+            pass
+        self.last_stats = self.last_value = self.last_depth = None
+        self.restart()
+        return 'timeout', None
+
+    # Lets a PlayerProcess stand in for the player anywhere, without a
+    # deadline.
+    def play_turn(self, board):
+        bit_board = BitBoard.from_list(board)
+        kind, value = self.request_move(bit_board.x, bit_board.o, None)
+        if kind == 'move':
+            board[:] = bit_board.apply(value, self.symbol).to_list()
+        elif kind == 'board' and value is not None:
+            board[:] = value
+        return board
@@ -0,0 +1,200 @@
+"""
+    Pondering: searching on the opponent's time.
+
+    With pondering on, the search runs in one background process that
+    lives for the whole game. After it returns a move it keeps searching
+    the positions after the opponent's most likely replies, principal
+    variation first, each for up to one time slice, filling its
+    transposition table. The next turn arrives as a message:
+
+    - if it is the position being pondered, that search simply carries on
+      under the real deadline (a ponder hit);
+    - if it is a position pondered earlier, the search starts over on a
+      table that already holds that work (also a hit);
+    - otherwise the ponder is dropped and a normal search runs (a miss).
+
+    Boards travel through a pipe as the two integer masks.
+"""
+
+import multiprocessing
+import time
+
+from bitboard import BitBoard
+from lines import five_in_a_row
+from search import SearchTimeout
+
+# Opponent replies pondered after every move.
+PONDER_REPLIES = 4
+
+
+class _PonderWorker:
+    def __init__(self, conn, symbol, bot_options):
+        from quixo_bot import QuixoBot
+
+        self.conn = conn
+        self.bot = QuixoBot(symbol, **bot_options)
+        self.searcher = self.bot.searcher
+        self.slice = bot_options.get('time_budget') or 1.0
+        self.position = None
+        self.pondered = {}
+        self.hit = None
+        self.pending = None
+
+    def run(self):
+        message = self.conn.recv()
+        while message[0] != 'close':
+            if message[0] == 'reset':
+                self.bot.reset(message[1])
+                self.pondered = {}
+                message = self.conn.recv()
+                continue
+            _, x, o, budget, max_depth = message
+            ponder_depth = self.pondered.get((x, o))
+            board = BitBoard(x, o)
+            result = self.search(board, time.perf_counter() + budget, max_depth)
+            self.conn.send(result + (ponder_depth,))
+            message = self.ponder(board, result[0], max_depth)
+        self.bot.close()
+
+    def search(self, board, deadline, max_depth):
+        bot = self.bot
+        if bot.tt is not None:
+            bot.tt.new_search()
+        bot.orderer.new_search()
+        move, _ = self.searcher.iterative_deepening(board, deadline, max_depth)
+        return move, self.searcher.depth_reached, self.searcher.nodes
+
+    # Reads a message that arrived during a ponder search. The real turn
+    # on the pondered position moves the deadline; anything else stops
+    # the ponder and is handled by run.
+    def check_messages(self):
+        if not self.conn.poll():
+            return
+        message = self.conn.recv()
+        if message[0] == 'go' and (message[1], message[2]) == self.position:
+            self.hit = self.searcher.depth_reached
+            self.searcher.deadline = time.perf_counter() + message[3]
+            return
+        self.pending = message
+        raise SearchTimeout()
+
+    # Ponders the replies to our move until a message stops it, and
+    # returns that message.
+    def ponder(self, board, move, max_depth):
+        while move is not None:
+            symbol = self.bot.symbol
+            board = board.apply(move, symbol)
+            self.pondered = {}
+            move = None
+            for reply in self.predicted_replies(board):
+                child = board.apply(reply, -symbol)
+                self.position = child.key()
+                self.hit = None
+                self.pending = None
+                self.searcher.interrupt = self.check_messages
+                try:
+                    result = self.search(child, time.perf_counter() + self.slice, max_depth)
+                finally:
+                    self.searcher.interrupt = None
+                if self.hit is not None:
+                    self.conn.send(result + (self.hit,))
+                    board, move = child, result[0]
+                    break
+                if self.pending is not None:
+                    return self.pending
+                self.pondered[self.position] = self.searcher.depth_reached
+        return self.conn.recv()
+
+    # The opponent's moves on board, table move first, without the ones
+    # that end the game.
+    def predicted_replies(self, board):
+        searcher = self.searcher
+        opponent = -self.bot.symbol
+        searcher.board = board
+        searcher.evaluator.reset(board.x, board.o)
+        _, _, _, tt_move = searcher.probe(0, float('-inf'), float('inf'), opponent)
+        replies = []
+        moves, count = searcher.ordered_moves(opponent, tt_move, 0)
+        for reply in moves[:count]:
+            child = board.apply(reply, opponent)
+            x_five, o_five = five_in_a_row(child.x, child.o)
+            if not (x_five or o_five):
+                replies.append(reply)
+                if len(replies) == PONDER_REPLIES:
+                    break
+        return replies
+
+
+def _run_worker(conn, symbol, bot_options):
+    _PonderWorker(conn, symbol, bot_options).run()
+
+
+class Ponderer:
+    # bot_options are passed to the QuixoBot built in the worker.
+    def __init__(self, symbol, bot_options=None):
+        self.symbol = symbol
+        self.bot_options = bot_options or {}
+        self.conn = None
+        self.process = None
+        self.nodes = 0
+        self.depth_reached = 0
+        self.hits = 0
+        self.misses = 0
+        self.hit_depths = []
+        self.miss_depths = []
+        self.ponder_depths = []
+        self.last_ponder_depth = None
+
+    def start(self):
+        if self.process is not None:
+            return
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_run_worker, args=(child_conn, self.symbol, self.bot_options),
+                                               daemon=True)
+        self.process.start()
+
+    def shutdown(self):
+        if self.process is None:
+            return
+        self.conn.send(('close',))
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+        self.process = None
+
+    def new_game(self, symbol):
+        self.symbol = symbol
+        if self.process is not None:
+            self.conn.send(('reset', symbol))
+
+    def search(self, board, budget, max_depth=None):
+        self.start()
+        self.conn.send(('go', board.x, board.o, budget, max_depth))
+        move, self.depth_reached, self.nodes, ponder_depth = self.conn.recv()
+        self.last_ponder_depth = ponder_depth
+        if ponder_depth is not None:
+            self.hits += 1
+            self.hit_depths.append(self.depth_reached)
+            self.ponder_depths.append(ponder_depth)
+        else:
+            self.misses += 1
+            self.miss_depths.append(self.depth_reached)
+        return move
+
+    # Ponder hit rate, the average depth reached on hits and misses
+    # (depth_gained is the difference) and the average depth the ponder
+    # had already finished when a hit arrived.
+    def stats(self):
+        turns = self.hits + self.misses
+        hit_depth = sum(self.hit_depths) / len(self.hit_depths) if self.hit_depths else 0.0
+        miss_depth = sum(self.miss_depths) / len(self.miss_depths) if self.miss_depths else 0.0
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / turns if turns else 0.0,
+            'hit_depth': hit_depth,
+            'miss_depth': miss_depth,
+            'ponder_depth': sum(self.ponder_depths) / len(self.ponder_depths) if self.ponder_depths else 0.0,
+            'depth_gained': hit_depth - miss_depth if self.hit_depths and self.miss_depths else 0.0,
+        }
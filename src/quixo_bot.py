@@ -1,5 +1,19 @@
+import time
+
 from tabulate import tabulate
-import copy
+from batch_eval import BatchEvaluator
+from bitboard import BitBoard, decode_move
+from book import Book
+from lines import LINE_MASKS, has_five, five_in_a_row, line_counts
+from incremental import IncrementalEvaluator
+from instrument import InstrumentedSearch, write_json_line
+from ordering import MoveOrderer
+from parallel import ParallelSearch
+from patterns import DEFAULT_WEIGHTS, PatternEvaluator, line_scores, load_weights
+from ponder import Ponderer
+from search import AlphaBetaSearch
+from tablebase import Tablebase
+from transposition import TranspositionTable
 
 class GameNode:
     def __init__(self, board, move=None, parent=None):
@@ -16,19 +30,20 @@ class GameNode:
         return self.value is not None or len(self.children) == 0
 
     def evaluate(self, bot_symbol, opponent_symbol):
-        lines = [self.board[i] for i in range(5)] + [[self.board[j][i] for j in range(5)] for i in range(5)]
-        lines.append([self.board[i][i] for i in range(5)])
-        lines.append([self.board[i][4 - i] for i in range(5)])
+        bot_mask, opp_mask = (self.board.x, self.board.o) if bot_symbol == 1 else (self.board.o, self.board.x)
         score = 0
-        for line in lines:
-            score += self.evaluate_line(line, bot_symbol, opponent_symbol)
+        for line in LINE_MASKS:
+            bot_count = (bot_mask & line).bit_count()
+            opp_count = (opp_mask & line).bit_count()
+            score += self.evaluate_counts(bot_count, opp_count, 5 - bot_count - opp_count)
         return score
 
     @staticmethod
     def evaluate_line(line, bot_symbol, opponent_symbol):
-        bot_count = line.count(bot_symbol)
-        opp_count = line.count(opponent_symbol)
-        empty_count = line.count(0)
+        return GameNode.evaluate_counts(line.count(bot_symbol), line.count(opponent_symbol), line.count(0))
+
+    @staticmethod
+    def evaluate_counts(bot_count, opp_count, empty_count):
         if bot_count == 5:
             return 1000
         elif opp_count == 5:
@@ -51,25 +66,37 @@ class GameNode:
             return -1
         return 0
 
+# Score of a single line indexed by [x_count][o_count], from X's point of view.
+LINE_SCORES = [[GameNode.evaluate_counts(x_count, o_count, 5 - x_count - o_count) if x_count + o_count <= 5 else 0
+                for o_count in range(6)] for x_count in range(6)]
+
 class GameTree:
     def __init__(self, root):
         self.root = root
+        # Nodes built below the root.
+        self.nodes = 0
 
+    # Every node keeps its own board, so leaves are scored with the bot's
+    # pattern table (12 lookups, with the bot's weights) from the board
+    # alone.
     def build_tree(self, bot, depth, maximizing_player):
         self.expand_node(self.root, bot, depth, maximizing_player)
 
     def expand_node(self, node, bot, depth, maximizing_player):
-        if depth == 0 or bot.is_winner(node.board, bot.symbol) or bot.is_winner(node.board, bot.opponent_symbol):
-            node.value = node.evaluate(bot.symbol, bot.opponent_symbol)
+        x_five, o_five = five_in_a_row(node.board.x, node.board.o)
+        if depth == 0 or x_five or o_five:
+            node.value = bot.patterns.score(node.board.x, node.board.o, bot.symbol)
             return
         moves = bot.generate_moves(node.board, bot.symbol if maximizing_player else bot.opponent_symbol)
         for move in moves:
             new_board = bot.apply_move(node.board, move, bot.symbol if maximizing_player else bot.opponent_symbol)
             child_node = GameNode(new_board, move, node)
             node.add_child(child_node)
+            self.nodes += 1
             self.expand_node(child_node, bot, depth - 1, not maximizing_player)
 
 class AlphaBeta:
+    # Returns the best child of node and keeps its value in self.value.
     def alpha_beta_search(self, node):
         infinity = float('inf')
         best_val = -infinity
@@ -80,6 +107,7 @@ class AlphaBeta:
             if value > best_val:
                 best_val = value
                 best_state = child
+        self.value = best_val if best_state is not None else None
         return best_state
 
     def max_value(self, node, alpha, beta):
@@ -105,68 +133,153 @@ class AlphaBeta:
         return value
 
 class QuixoBot:
-    ALLOWED_PIECES_RIGHT = [(0, 0), (0, 1), (0, 2), (0, 3), (1, 0), (2, 0), (3, 0), (4, 0), (4, 1), (4, 2), (4, 3)]
-    ALLOWED_PIECES_LEFT = [(0, 1), (0, 2), (0, 3), (1, 4), (2, 4), (3, 4), (4, 4), (4, 1), (4, 2), (4, 3), (4, 4)]
-    ALLOWED_PIECES_UP = [(1, 0), (1, 4), (2, 0), (2, 4), (3, 0), (3, 4), (4, 0), (4, 1), (4, 2), (4, 3), (4, 4)]
-    ALLOWED_PIECES_DOWN = [(0, 0), (0, 1), (0, 2), (0, 3), (0, 4), (1, 0), (1, 4), (2, 0), (2, 4), (3, 0), (3, 4)]
-    ALLOWED_PIECES_GENERAL = [(0, 0), (0, 1), (0, 2), (0, 3), (0, 4), (1, 0), (1, 4), (2, 0), (2, 4), (3, 0), (3, 4), (4, 0), (4, 1), (4, 2), (4, 3), (4, 4)]
-
-    def __init__(self, symbol):
+    # search_mode 'depth_first' walks a single board with make/unmake;
+    # 'tree' builds the full GameTree first, which is slower but keeps
+    # every node around for debugging and visualisation.
+    # With a time_budget (seconds) the depth-first search deepens until
+    # time_budget - safety_margin has passed, up to depth if one is given.
+    # Without one it searches to a fixed depth.
+    # tt_size_mb caps the transposition table, which lives for the whole
+    # game; 0 disables it. With symmetry the table only stores canonical
+    # positions. workers > 1 splits the root moves of a timed search over
+    # a process pool (see parallel.py). batch_leaves scores the last ply
+    # with NumPy in one call per node (needs numpy). weights replaces the
+    # 1000/100/10/5/1 line weights, as a tuple or the path of a weight file
+    # (see patterns.py; tune.py fits one to game records). tablebase is the path
+    # of a full-board tablebase probed at every full board of the search.
+    # book is the path of an opening book (see book.py); a position found
+    # there is played without searching. ponder moves the timed search to
+    # a background process that keeps searching on the opponent's time
+    # (see ponder.py). instrument keeps per-move search statistics of the
+    # depth-first search in last_stats, and stats_log also appends them to
+    # that file as JSON lines (see instrument.py). pvs searches with null
+    # windows after the first move, and lmr adds late-move reductions to
+    # it (see search.py).
+    def __init__(self, symbol, search_mode='depth_first', depth=None, time_budget=1.0, safety_margin=0.2, tt_size_mb=16, symmetry=True, workers=1, batch_leaves=False, weights=None, tablebase=None, book=None, ponder=False, instrument=False, stats_log=None, pvs=False, lmr=False):
         self.symbol = symbol
         self.opponent_symbol = 1 if symbol == -1 else -1
         self.board = [[0] * 5 for _ in range(5)]
         self.name = "Kuri Bot"
+        self.search_mode = search_mode
+        self.depth = depth
+        self.time_budget = time_budget
+        self.safety_margin = safety_margin
+        self.tt = TranspositionTable(tt_size_mb) if tt_size_mb else None
+        self.orderer = MoveOrderer()
+        if isinstance(weights, str):
+            weights = load_weights(weights)
+        self.weights = tuple(weights) if weights is not None else DEFAULT_WEIGHTS
+        scores = line_scores(self.weights) if weights is not None else LINE_SCORES
+        # Whole-board scores for the tree search, which has no incremental
+        # evaluator to carry them.
+        self.patterns = PatternEvaluator(self.weights)
+        batch = BatchEvaluator(scores) if batch_leaves else None
+        self.tablebase = Tablebase(tablebase) if tablebase is not None else None
+        self.book = Book(book) if book is not None else None
+        self.instrument = instrument or stats_log is not None
+        self.stats_log = stats_log
+        search_class = InstrumentedSearch if self.instrument else AlphaBetaSearch
+        self.searcher = search_class(self, IncrementalEvaluator(scores), self.tt, symmetry, self.orderer, batch,
+                                     self.tablebase, pvs, lmr)
+        self.last_depth = 0
+        self.last_nodes = 0
+        # Search value of the last move from our point of view, or None
+        # when the search that chose it does not report one (pondering).
+        self.last_value = None
+        self.last_stats = None
+        self.last_move = None
+        search_options = {'time_budget': time_budget, 'tt_size_mb': tt_size_mb, 'symmetry': symmetry,
+                          'batch_leaves': batch_leaves, 'weights': weights, 'tablebase': tablebase,
+                          'pvs': pvs, 'lmr': lmr}
+        self.parallel = ParallelSearch(workers, search_options) if workers > 1 else None
+        if self.parallel is not None:
+            # The pool is started here, not on the first move, which has
+            # to fit in the move timeout.
+            self.parallel.start()
+        self.ponderer = Ponderer(symbol, search_options) if ponder else None
 
+    # The search works on a BitBoard; the 5x5 list is only converted on
+    # the way in and on the way out.
     def play_turn(self, board):
-        root = GameNode(board)
+        start = time.perf_counter()
+        bit_board = BitBoard.from_list(board)
+        if self.search_mode == 'tree':
+            new_board = self.tree_search(bit_board)
+        else:
+            if self.tt is not None:
+                self.tt.new_search()
+            self.orderer.new_search()
+            if self.instrument:
+                self.searcher.begin()
+            book_move = self.book_move(bit_board)
+            if book_move is not None:
+                move = book_move
+            elif self.tablebase is not None and bit_board.is_full():
+                move, self.last_value = self.searcher.tablebase_move(bit_board)
+                self.last_depth = 0
+                self.last_nodes = 0
+            elif self.ponderer is not None and self.time_budget is not None:
+                budget = start + self.time_budget - self.safety_margin - time.perf_counter()
+                move = self.ponderer.search(bit_board, budget, self.depth)
+                self.last_value = None
+                self.last_depth = self.ponderer.depth_reached
+                self.last_nodes = self.ponderer.nodes
+            elif self.parallel is not None and self.time_budget is not None:
+                deadline = start + self.time_budget - self.safety_margin
+                move = self.parallel.search(bit_board, self.symbol, deadline, self.depth)
+                self.last_value = self.parallel.value
+                self.last_depth = self.parallel.depth_reached
+                self.last_nodes = self.parallel.nodes
+            elif self.time_budget is not None:
+                deadline = start + self.time_budget - self.safety_margin
+                move, self.last_value = self.searcher.iterative_deepening(bit_board, deadline, self.depth)
+                self.last_depth = self.searcher.depth_reached
+                self.last_nodes = self.searcher.nodes
+            else:
+                self.searcher.nodes = 0
+                move, self.last_value = self.searcher.search(bit_board, self.fixed_depth())
+                self.last_depth = self.fixed_depth()
+                self.last_nodes = self.searcher.nodes
+            if self.instrument:
+                self.record_stats()
+            # The only place a move id is turned back into (direction, cell).
+            self.last_move = decode_move(move) if move is not None else None
+            new_board = bit_board.apply(move, self.symbol) if move is not None else None
+        if new_board:
+            board[:] = new_board.to_list()
+        return board
+
+    def record_stats(self):
+        self.last_stats = self.searcher.finish(self.last_depth, self.last_nodes)
+        self.last_stats['symbol'] = self.symbol
+        if self.stats_log is not None:
+            write_json_line(self.stats_log, self.last_stats)
+
+    def book_move(self, bit_board):
+        if self.book is None:
+            return None
+        entry = self.book.probe(bit_board.x, bit_board.o, self.symbol)
+        if entry is None or entry[0] not in bit_board.generate_moves(self.symbol):
+            return None
+        self.last_depth = entry[1]
+        self.last_nodes = 0
+        self.last_value = entry[2]
+        return entry[0]
+
+    def tree_search(self, bit_board):
+        root = GameNode(bit_board)
         tree = GameTree(root)
-        tree.build_tree(self, 2, True)
+        tree.build_tree(self, self.fixed_depth(), True)
         alphabeta = AlphaBeta()
         best_node = alphabeta.alpha_beta_search(root)
-        move = best_node.move if best_node else None
-        if move:
-            direction, (row, col) = move
-            if direction == 'right':
-                self.move_right(board, row, col)
-            elif direction == 'left':
-                self.move_left(board, row, col)
-            elif direction == 'up':
-                self.move_up(board, row, col)
-            elif direction == 'down':
-                self.move_down(board, row, col)
-        return board
+        self.last_value = alphabeta.value
+        self.last_depth = self.fixed_depth()
+        self.last_nodes = tree.nodes
+        self.last_move = decode_move(best_node.move) if best_node else None
+        return best_node.board if best_node else None
 
-    def move_right(self, board, row, col, end_col=4):
-        piece = board[row][col]
-        if (row, col) in self.ALLOWED_PIECES_RIGHT:
-            if piece == 0 or piece == self.symbol:
-                for i in range(col, end_col):
-                    board[row][i] = board[row][i + 1]
-                board[row][end_col] = self.symbol
-
-    def move_left(self, board, row, col, end_col=0):
-        piece = board[row][col]
-        if (row, col) in self.ALLOWED_PIECES_LEFT:
-            if piece == 0 or piece == self.symbol:
-                for i in range(col, end_col, -1):
-                    board[row][i] = board[row][i - 1]
-                board[row][end_col] = self.symbol
-
-    def move_up(self, board, row, col, end_row=0):
-        piece = board[row][col]
-        if (row, col) in self.ALLOWED_PIECES_UP:
-            if piece == 0 or piece == self.symbol:
-                for i in range(row, end_row, -1):
-                    board[i][col] = board[i - 1][col]
-                board[end_row][col] = self.symbol
-
-    def move_down(self, board, row, col, end_row=4):
-        piece = board[row][col]
-        if (row, col) in self.ALLOWED_PIECES_DOWN:
-            if piece == 0 or piece == self.symbol:
-                for i in range(row, end_row):
-                    board[i][col] = board[i + 1][col]
-                board[end_row][col] = self.symbol
+    def fixed_depth(self):
+        return self.depth if self.depth is not None else 2
 
     def print_board(self, board=None):
         if board is None:
@@ -179,74 +292,38 @@ class QuixoBot:
         self.symbol = symbol
         self.opponent_symbol = 1 if symbol == -1 else -1
         self.board = [[0] * 5 for _ in range(5)]
+        if self.tt is not None:
+            self.tt.clear()
+        self.orderer.clear()
+        if self.parallel is not None:
+            self.parallel.start()
+            self.parallel.new_game()
+        if self.ponderer is not None:
+            self.ponderer.new_game(symbol)
+
+    def close(self):
+        if self.parallel is not None:
+            self.parallel.shutdown()
+        if self.ponderer is not None:
+            self.ponderer.shutdown()
+        if self.tablebase is not None:
+            self.tablebase.close()
+        if self.book is not None:
+            self.book.close()
 
     def is_winner(self, board, symbol):
-        lines = [board[i] for i in range(5)] + [[board[j][i] for j in range(5)] for i in range(5)]
-        lines.append([board[i][i] for i in range(5)])
-        lines.append([board[i][4 - i] for i in range(5)])
-        for line in lines:
-            if all(cell == symbol for cell in line):
-                return True
-        return False
+        return has_five(board.x if symbol == 1 else board.o)
 
     def is_full(self, board):
-        return all(cell != 0 for row in board for cell in row)
+        return board.is_full()
 
     def generate_moves(self, board, symbol):
-        moves = []
-        allowed_positions = self.ALLOWED_PIECES_GENERAL
-        for direction in ['right', 'left', 'up', 'down']:
-            for row, col in allowed_positions:
-                if board[row][col] == 0 or board[row][col] == symbol:
-                    if self.is_valid_move(board, direction, row, col, symbol):
-                        moves.append((direction, (row, col)))
+        moves = board.generate_moves(symbol)
         return self.prioritize_moves(moves, board, symbol)
 
     def prioritize_moves(self, moves, board, symbol):
-        prioritized_moves = sorted(moves, key=lambda move: self.evaluate_move(move, board, symbol), reverse=True)
-        return prioritized_moves
-
-    def evaluate_move(self, move, board, symbol):
-        direction, (row, col) = move
-        center_distance = abs(2 - row) + abs(2 - col)
-        board_copy = copy.deepcopy(board)
-        self.apply_move(board_copy, move, symbol)
-        if self.check_two_in_a_row(board_copy, symbol):
-            return 100 - center_distance
-        opponent_winning = self.check_two_in_a_row(board_copy, self.opponent_symbol)
-        if opponent_winning:
-            return 200
-        return center_distance
-
-    def is_valid_move(self, board, direction, row, col, symbol):
-        if direction == 'right' and col < 4 and (board[row][col + 1] == 0 or board[row][col + 1] == symbol):
-            return True
-        if direction == 'left' and col > 0 and (board[row][col - 1] == 0 or board[row][col - 1] == symbol):
-            return True
-        if direction == 'up' and row > 0 and (board[row - 1][col] == 0 or board[row - 1][col] == symbol):
-            return True
-        if direction == 'down' and row < 4 and (board[row + 1][col] == 0 or board[row + 1][col] == symbol):
-            return True
-        return False
+        x_counts, o_counts = zip(*line_counts(board.x, board.o))
+        return self.orderer.order(moves, board.x, board.o, symbol, x_counts, o_counts)
 
     def apply_move(self, board, move, symbol):
-        new_board = copy.deepcopy(board)
-        direction, (row, col) = move
-        if direction == 'right':
-            self.move_right(new_board, row, col)
-        elif direction == 'left':
-            self.move_left(new_board, row, col)
-        elif direction == 'up':
-            self.move_up(new_board, row, col)
-        elif direction == 'down':
-            self.move_down(new_board, row, col)
-        return new_board
-
-    def check_two_in_a_row(self, board, symbol):
-        lines = [board[i] for i in range(5)] + [[board[j][i] for j in range(5)] for i in range(5)]
-        lines.append([board[i][i] for i in range(5)])
-        lines.append([board[i][4 - i] for i in range(5)])
-        for line in lines:
-            if line.count(symbol) == 2 and line.count(0) == 3:
-                return True
-        return False
\ No newline at end of file
+        return board.apply(move, symbol)
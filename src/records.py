@@ -0,0 +1,178 @@
+"""
+    Binary game records.
+
+    Every move played is one fixed-size record: the position before the
+    move as the two 25-bit masks packed in one integer, the move id, the
+    side that moved, the final result of the game, the ply, and the
+    search value (mover's point of view) and depth if the player reported
+    them. The moves of a game are consecutive and their ply starts at 0.
+
+    GameRecordWriter keeps the moves of the current game only and appends
+    the whole game to the current chunk file when it ends. Chunk files
+    are never rewritten: a writer claims a new file name for each chunk,
+    so several processes can write to the same directory. The readers are
+    generators that go through the files a block at a time.
+
+    python tournament.py quixo_bot:QuixoBot quixo_random:QuixoRandomBot --games 1000 --records games/
+    python records.py stats games/
+"""
+
+import argparse
+import glob
+import os
+import struct
+from collections import namedtuple
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+MAGIC = b'QXGR0001'
+# x | o << 25, move, side, result, ply, value, depth
+RECORD = struct.Struct('<QBbbHiB')
+# Value of a move whose player did not report one.
+NO_VALUE = -(1 << 31)
+CHUNK_RECORDS = 1 << 20
+# Records read from a file at a time.
+READ_BLOCK = 1 << 14
+EXTENSION = '.qxr'
+
+Record = namedtuple('Record', ['x', 'o', 'move', 'side', 'result', 'ply', 'value', 'depth'])
+
+if HAS_NUMPY:
+    RECORD_DTYPE = np.dtype([('boards', '<u8'), ('move', 'u1'), ('side', 'i1'), ('result', 'i1'),
+                             ('ply', '<u2'), ('value', '<i4'), ('depth', 'u1')])
+
+
+class GameRecordWriter:
+    # Chunks are directory/prefix-NNNNNN.qxr; a new one is started once
+    # the current one holds chunk_records records (games are not split).
+    def __init__(self, directory, prefix='games', chunk_records=CHUNK_RECORDS):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.chunk_records = chunk_records
+        self.file = None
+        self.chunk_size = 0
+        self.next_index = 0
+        self.moves = []
+        self.games = 0
+
+    def _open_chunk(self):
+        while True:
+            path = os.path.join(self.directory, '%s-%06d%s' % (self.prefix, self.next_index, EXTENSION))
+            self.next_index += 1
+            try:
+                self.file = open(path, 'xb')
+            except FileExistsError:
+                continue
+            self.file.write(MAGIC)
+            self.chunk_size = 0
+            return
+
+    # A legal move of side on (x, o); value and depth may be None.
+    def add_move(self, x, o, move, side, value=None, depth=None):
+        self.moves.append((x | o << 25, move, side, NO_VALUE if value is None else int(value),
+                           min(depth or 0, 255)))
+
+    # Writes the moves added since the last call as one game that ended
+    # with result (winning symbol, 0 for a draw).
+    def end_game(self, result):
+        moves, self.moves = self.moves, []
+        if not moves:
+            return
+        if self.file is None or self.chunk_size >= self.chunk_records:
+            self.close()
+            self._open_chunk()
+        self.file.write(b''.join(RECORD.pack(boards, move, side, result, ply, value, depth)
+                                 for ply, (boards, move, side, value, depth) in enumerate(moves)))
+        self.file.flush()
+        self.chunk_size += len(moves)
+        self.games += 1
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+# Chunk files of a directory in name order, or the paths given.
+def record_files(paths):
+    if isinstance(paths, str):
+        paths = [paths]
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*' + EXTENSION))))
+        else:
+            files.append(path)
+    return files
+
+
+# Raw record bytes of every file, READ_BLOCK records at a time. A partial
+# record at the end of a file (a writer that died mid-write) is dropped.
+def _blocks(paths, block=READ_BLOCK):
+    for path in record_files(paths):
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError("%s is not a Quixo game record file" % path)
+            while True:
+                data = f.read(block * RECORD.size)
+                usable = len(data) - len(data) % RECORD.size
+                if usable:
+                    yield data[:usable]
+                if len(data) < block * RECORD.size:
+                    break
+
+
+def read_records(paths):
+    for data in _blocks(paths):
+        for boards, move, side, result, ply, value, depth in RECORD.iter_unpack(data):
+            yield Record(boards & 0x1FFFFFF, boards >> 25, move, side, result, ply,
+                         None if value == NO_VALUE else value, depth)
+
+
+# Lists of the records of one game.
+def read_games(paths):
+    game = []
+    for record in read_records(paths):
+        if record.ply == 0 and game:
+            yield game
+            game = []
+        game.append(record)
+    if game:
+        yield game
+
+
+# Structured arrays (RECORD_DTYPE) of at most block records each.
+def read_arrays(paths, block=1 << 20):
+    if not HAS_NUMPY:
+        raise ImportError("read_arrays needs numpy")
+    for data in _blocks(paths, block):
+        yield np.frombuffer(data, dtype=RECORD_DTYPE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quixo game records")
+    commands = parser.add_subparsers(dest='command', required=True)
+    stats_parser = commands.add_parser('stats', help="count the games and moves of record files")
+    stats_parser.add_argument('paths', nargs='+')
+    args = parser.parse_args()
+
+    if args.command == 'stats':
+        games = moves = 0
+        results = {1: 0, -1: 0, 0: 0}
+        for record in read_records(args.paths):
+            moves += 1
+            if record.ply == 0:
+                games += 1
+                results[record.result] += 1
+        print("%d games, %d moves (%.1f per game)" % (games, moves, moves / games if games else 0))
+        print("X wins %d, O wins %d, draws %d" % (results[1], results[-1], results[0]))
+
+
+if __name__ == "__main__":
+    main()
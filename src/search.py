@@ -0,0 +1,372 @@
+"""
+    Depth-first alpha-beta over a single BitBoard.
+
+    Children are generated inside max_value/min_value and walked with
+    make/unmake, so a cutoff skips the rest of the subtree instead of
+    pruning one that has already been built.
+"""
+
+import time
+
+from bitboard import FULL, NUM_MOVES, apply_move, generate_moves_into
+from lines import five_in_a_row, winner
+from ordering import MAX_PLY, MoveOrderer, is_quiet
+from symmetry import canonical, from_canonical_move, to_canonical_move
+from tablebase import WIN_SCORE
+from transposition import EXACT, LOWER, UPPER, zobrist_hash
+
+# Nodes between two clock reads during a timed search.
+CHECK_INTERVAL = 256
+# Finished games score +-WIN_SCORE (tablebase wins a little less), far
+# above any static score: a root value past WIN_BAND is a proven result.
+WIN_BAND = WIN_SCORE // 2
+# Late-move reductions: quiet moves from LMR_MIN_INDEX on, at nodes with
+# at least LMR_MIN_DEPTH left, are first searched one ply less, and two
+# from LMR_LATE_INDEX on (always leaving at least one ply).
+LMR_MIN_INDEX = 3
+LMR_LATE_INDEX = 6
+LMR_MIN_DEPTH = 3
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class AlphaBetaSearch:
+    # batch, a BatchEvaluator, scores all the children of a node one ply
+    # above the leaves in a single call instead of walking them. tablebase
+    # gives the exact value of any full board (see tablebase.py).
+    # pvs searches every move after the first with a null window and only
+    # re-searches it with the full window when it beats the best so far.
+    # lmr (only with pvs) also reduces late quiet moves, re-searching them
+    # at full depth when the reduced search fails high.
+    def __init__(self, bot, evaluator, tt=None, symmetry=True, orderer=None, batch=None, tablebase=None,
+                 pvs=False, lmr=False):
+        self.bot = bot
+        self.evaluator = evaluator
+        self.batch = batch
+        self.tablebase = tablebase
+        self.tt = tt
+        self.symmetry = symmetry
+        self.orderer = orderer if orderer is not None else MoveOrderer()
+        # One move buffer of NUM_MOVES items per ply, refilled in place at
+        # every node instead of building a new list.
+        self.move_buffers = [[0] * NUM_MOVES for _ in range(MAX_PLY + 1)]
+        self.pvs = pvs
+        self.lmr = pvs and lmr
+        # Nodes with less depth left are never reduced; past the search
+        # depth it turns the reductions off and leaves the rest of LMR.
+        self.lmr_min_depth = LMR_MIN_DEPTH
+        # Reduced searches and re-searches (null window or reduction
+        # failed high), counted over the life of the searcher.
+        self.reduced = 0
+        self.researched = 0
+        self.board = None
+        self.nodes = 0
+        self.depth_reached = 0
+        self.deadline = None
+        self.next_check = 0
+        self.best_exact = False
+        self.completed = []
+        # Called at every clock read; may move the deadline or raise
+        # SearchTimeout (see ponder.py).
+        self.interrupt = None
+
+    # Searches depth 1, 2, 3... until the deadline and returns the best
+    # move of the last depth that finished. The previous best move is
+    # searched first at the next depth. completed keeps (move, value,
+    # exact) for every finished depth. The depth never goes past MAX_PLY,
+    # and a search of all the root moves stops once it proves a win or a
+    # loss, since deeper searches cannot change that.
+    def iterative_deepening(self, board, deadline, max_depth=None, root_moves=None, shared_alpha=None):
+        self.nodes = 0
+        self.depth_reached = 0
+        self.deadline = deadline
+        self.next_check = CHECK_INTERVAL
+        self.completed = []
+        start = (board.x, board.o)
+        best_move = None
+        best_val = None
+        max_depth = MAX_PLY if max_depth is None else min(max_depth, MAX_PLY)
+        depth = 1
+        try:
+            while depth <= max_depth:
+                best_move, best_val = self.search(board, depth, best_move, root_moves, shared_alpha)
+                self.depth_reached = depth
+                self.completed.append((best_move, best_val, self.best_exact))
+                if root_moves is None and abs(best_val) >= WIN_BAND:
+                    break
+                depth += 1
+        except SearchTimeout:
+            board.x, board.o = start
+            board.history.clear()
+        finally:
+            self.deadline = None
+        if best_move is None:
+            moves = board.generate_moves(self.bot.symbol)
+            best_move = moves[0] if moves else None
+        return best_move, best_val
+
+    # root_moves restricts the search to part of the root moves, and
+    # shared_alpha lets several searches over disjoint parts raise each
+    # other's alpha (see parallel.py). best_exact is False when the best
+    # value is only an upper bound because another search had a better
+    # alpha.
+    def search(self, board, depth, first_move=None, root_moves=None, shared_alpha=None):
+        self.board = board
+        self.evaluator.reset(board.x, board.o)
+        infinity = float('inf')
+        best_val = -infinity
+        beta = infinity
+        best_move = None
+        self.best_exact = False
+        moves, count = self.ordered_moves(self.bot.symbol, first_move, 0)
+        if root_moves is not None:
+            moves = [moves[i] for i in range(count) if moves[i] in root_moves]
+            count = len(moves)
+        for index in range(count):
+            move = moves[index]
+            alpha = best_val
+            if shared_alpha is not None:
+                alpha = max(alpha, shared_alpha.get(depth))
+            self.make(move, self.bot.symbol)
+            if self.pvs and index > 0 and alpha > -infinity:
+                value = self.min_value(depth - 1, alpha, alpha + 1, 1)
+                if value > alpha:
+                    self.researched += 1
+                    value = self.min_value(depth - 1, alpha, beta, 1)
+            else:
+                value = self.min_value(depth - 1, alpha, beta, 1)
+            self.unmake()
+            if value > best_val:
+                best_val = value
+                best_move = move
+                self.best_exact = value > alpha
+            if shared_alpha is not None and value > alpha:
+                shared_alpha.raise_to(depth, value)
+        return best_move, best_val
+
+    def count_nodes(self, count):
+        self.nodes += count
+        if self.deadline is not None and self.nodes >= self.next_check:
+            self.next_check = self.nodes + CHECK_INTERVAL
+            if self.interrupt is not None:
+                self.interrupt()
+            if time.perf_counter() >= self.deadline:
+                raise SearchTimeout()
+
+    def make(self, move, symbol):
+        self.count_nodes(1)
+        self.board.make(move, symbol)
+        self.evaluator.make(self.board.x, self.board.o, move)
+
+    def unmake(self):
+        self.board.unmake()
+        self.evaluator.unmake()
+
+    def is_leaf(self, depth):
+        if depth == 0:
+            return True
+        x_five, o_five = five_in_a_row(self.board.x, self.board.o)
+        return x_five or o_five
+
+    # Value of a leaf reached by a move of last_mover: +-WIN_SCORE if the
+    # move finished the game, else the static score.
+    def leaf_value(self, last_mover):
+        over, winning_symbol = winner(self.board.x, self.board.o, last_mover)
+        if over:
+            return WIN_SCORE if winning_symbol == self.bot.symbol else -WIN_SCORE
+        return self.evaluator.score_for(self.bot.symbol)
+
+    # Best move of a full board read straight from the tablebase: the
+    # fastest win, else a draw, else the slowest loss.
+    def tablebase_move(self, board):
+        symbol = self.bot.symbol
+        best_move = None
+        best_val = None
+        for move in board.generate_moves(symbol):
+            board.make(move, symbol)
+            over, winning_symbol = winner(board.x, board.o, symbol)
+            if over:
+                value = WIN_SCORE if winning_symbol == symbol else -WIN_SCORE
+            else:
+                value = self.tablebase.score(board.x, board.o, -symbol, symbol)
+            board.unmake()
+            if best_val is None or value > best_val:
+                best_move, best_val = move, value
+        return best_move, best_val
+
+    # Exact value of a full board with no five in a row, or None.
+    def tablebase_value(self, symbol):
+        x, o = self.board.x, self.board.o
+        if (x | o) != FULL:
+            return None
+        x_five, o_five = five_in_a_row(x, o)
+        if x_five or o_five:
+            return None
+        return self.tablebase.score(x, o, symbol, self.bot.symbol)
+
+    # Returns (key, transform, value, tt_move). With symmetry on, the key
+    # is the hash of the canonical board and transform maps this board
+    # onto it. value is not None when the stored result is deep enough to
+    # answer this node within (alpha, beta).
+    def probe(self, depth, alpha, beta, symbol):
+        if self.tt is None:
+            return None, 0, None, None
+        if self.symmetry:
+            x, o, t = canonical(self.board.x, self.board.o)
+        else:
+            x, o, t = self.board.x, self.board.o, 0
+        key = zobrist_hash(x, o, symbol)
+        entry = self.tt.probe(key)
+        if entry is None:
+            return key, t, None, None
+        _, tt_depth, score, bound, tt_move, _ = entry
+        if tt_move is not None:
+            tt_move = from_canonical_move(tt_move, t)
+        if tt_depth >= depth:
+            if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha):
+                return key, t, score, tt_move
+        return key, t, None, tt_move
+
+    def store(self, key, t, depth, value, bound, move):
+        self.tt.store(key, depth, value, bound, to_canonical_move(move, t))
+
+    # Plies to take off the search of a move, decided before it is made.
+    def reduction(self, move, index, depth, ply):
+        killers = self.orderer.killers
+        if index < LMR_MIN_INDEX or depth < self.lmr_min_depth or (ply < len(killers) and move in killers[ply]):
+            return 0
+        if not is_quiet(move, self.evaluator.x_counts, self.evaluator.o_counts):
+            return 0
+        self.reduced += 1
+        return min(1 if index < LMR_LATE_INDEX else 2, depth - 2)
+
+    # Generates the moves of the node at ply into its buffer. Returns the
+    # buffer and the number of moves at its start.
+    def generate_moves(self, symbol, ply):
+        board = self.board
+        moves = self.move_buffers[ply]
+        return moves, generate_moves_into(board.x, board.o, symbol, moves)
+
+    def ordered_moves(self, symbol, tt_move, ply):
+        board = self.board
+        moves, count = self.generate_moves(symbol, ply)
+        self.orderer.order(moves, board.x, board.o, symbol, self.evaluator.x_counts, self.evaluator.o_counts,
+                           ply, tt_move, count)
+        return moves, count
+
+    # Every child of a depth 1 node is a leaf, so its value is the best
+    # (pick is max or min) leaf value among them, found without pruning.
+    def frontier_value(self, key, t, symbol, pick, ply):
+        board = self.board
+        moves, count = self.generate_moves(symbol, ply)
+        if not count:
+            return self.evaluator.score_for(self.bot.symbol)
+        self.count_nodes(count)
+        children = [apply_move(board.x, board.o, moves[i], symbol) for i in range(count)]
+        scores = self.batch.evaluate_masks([x for x, _ in children], [o for _, o in children],
+                                           self.bot.symbol).tolist()
+        for i, (x, o) in enumerate(children):
+            over, winning_symbol = winner(x, o, symbol)
+            if over:
+                scores[i] = WIN_SCORE if winning_symbol == self.bot.symbol else -WIN_SCORE
+        value = pick(scores)
+        if self.tt is not None:
+            self.store(key, t, 1, value, EXACT, moves[scores.index(value)])
+        return value
+
+    # ply is the distance from the root, which the depth left no longer
+    # tells once moves are reduced.
+    def max_value(self, depth, alpha, beta, ply):
+        if self.tablebase is not None:
+            value = self.tablebase_value(self.bot.symbol)
+            if value is not None:
+                return value
+        if self.is_leaf(depth):
+            return self.leaf_value(self.bot.opponent_symbol)
+        key, t, tt_value, tt_move = self.probe(depth, alpha, beta, self.bot.symbol)
+        if tt_value is not None:
+            return tt_value
+        if depth == 1 and self.batch is not None:
+            return self.frontier_value(key, t, self.bot.symbol, max, ply)
+        moves, count = self.ordered_moves(self.bot.symbol, tt_move, ply)
+        if not count:
+            return self.evaluator.score_for(self.bot.symbol)
+        alpha_orig = alpha
+        value = float('-inf')
+        best_move = None
+        for index in range(count):
+            move = moves[index]
+            if index == 0 or not self.pvs:
+                self.make(move, self.bot.symbol)
+                child = self.min_value(depth - 1, alpha, beta, ply + 1)
+            else:
+                reduction = self.reduction(move, index, depth, ply) if self.lmr else 0
+                self.make(move, self.bot.symbol)
+                child = self.min_value(depth - 1 - reduction, alpha, alpha + 1, ply + 1)
+                if reduction and child > alpha:
+                    self.researched += 1
+                    child = self.min_value(depth - 1, alpha, alpha + 1, ply + 1)
+                if alpha < child < beta:
+                    self.researched += 1
+                    child = self.min_value(depth - 1, alpha, beta, ply + 1)
+            self.unmake()
+            if child > value:
+                value = child
+                best_move = move
+            if value >= beta:
+                self.orderer.cutoff(move, index, ply, depth, self.bot.symbol)
+                break
+            alpha = max(alpha, value)
+        if self.tt is not None:
+            bound = LOWER if value >= beta else UPPER if value <= alpha_orig else EXACT
+            self.store(key, t, depth, value, bound, best_move)
+        return value
+
+    def min_value(self, depth, alpha, beta, ply):
+        if self.tablebase is not None:
+            value = self.tablebase_value(self.bot.opponent_symbol)
+            if value is not None:
+                return value
+        if self.is_leaf(depth):
+            return self.leaf_value(self.bot.symbol)
+        key, t, tt_value, tt_move = self.probe(depth, alpha, beta, self.bot.opponent_symbol)
+        if tt_value is not None:
+            return tt_value
+        if depth == 1 and self.batch is not None:
+            return self.frontier_value(key, t, self.bot.opponent_symbol, min, ply)
+        moves, count = self.ordered_moves(self.bot.opponent_symbol, tt_move, ply)
+        if not count:
+            return self.evaluator.score_for(self.bot.symbol)
+        beta_orig = beta
+        value = float('inf')
+        best_move = None
+        for index in range(count):
+            move = moves[index]
+            if index == 0 or not self.pvs:
+                self.make(move, self.bot.opponent_symbol)
+                child = self.max_value(depth - 1, alpha, beta, ply + 1)
+            else:
+                reduction = self.reduction(move, index, depth, ply) if self.lmr else 0
+                self.make(move, self.bot.opponent_symbol)
+                child = self.max_value(depth - 1 - reduction, beta - 1, beta, ply + 1)
+                if reduction and child < beta:
+                    self.researched += 1
+                    child = self.max_value(depth - 1, beta - 1, beta, ply + 1)
+                if alpha < child < beta:
+                    self.researched += 1
+                    child = self.max_value(depth - 1, alpha, beta, ply + 1)
+            self.unmake()
+            if child < value:
+                value = child
+                best_move = move
+            if value <= alpha:
+                self.orderer.cutoff(move, index, ply, depth, self.bot.opponent_symbol)
+                break
+            beta = min(beta, value)
+        if self.tt is not None:
+            bound = UPPER if value <= alpha else LOWER if value >= beta_orig else EXACT
+            self.store(key, t, depth, value, bound, best_move)
+        return value
+
@@ -0,0 +1,159 @@
+"""
+    Batched random self-play with NumPy.
+
+    BatchSimulator advances M games at once. The boards are an (M, 25)
+    int8 array of -1/0/1 in cell order (cell r * 5 + c, as in BitBoard)
+    and every game has its own side to move. One step computes the legal
+    moves of every running game, draws one uniformly at random, applies
+    it as a single gather through a per-move cell permutation and checks
+    the 12 lines with one matrix product. Games finish independently; a
+    finished game is left alone while the others go on.
+
+    It is both a fast random opponent baseline and a rollout engine:
+    random_playouts(xs, os, symbols) plays out a batch of positions given
+    as bit masks, with the same rules as quixo_random.random_playout.
+
+    python simulate.py --games 100000 --max-plies 100
+"""
+
+import argparse
+import time
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+from batch_eval import LINE_INCIDENCE, masks_to_array
+from bitboard import ALL_MOVES, CELLS, MOVE_DEST, MOVE_SEG, MOVE_SHL, MOVE_SHR, MOVE_SRC
+
+
+def _move_tables():
+    # PERM[move][cell] is the cell whose piece ends up in cell after the
+    # move; the destination cell is overwritten by the mover afterwards.
+    perm = [list(range(CELLS)) for _ in ALL_MOVES]
+    for move in ALL_MOVES:
+        for cell in range(CELLS):
+            if MOVE_SEG[move] >> cell & 1:
+                perm[move][cell - MOVE_SHR[move] + MOVE_SHL[move]] = cell
+    src = [MOVE_SRC[move].bit_length() - 1 for move in ALL_MOVES]
+    dest = [MOVE_DEST[move].bit_length() - 1 for move in ALL_MOVES]
+    return perm, src, dest
+
+
+class BatchSimulator:
+    # games boards, all empty with X to move until reset() says otherwise.
+    # Games still running after max_plies of their own count as draws.
+    def __init__(self, games, max_plies=100, seed=None):
+        if not HAS_NUMPY:
+            raise ImportError("BatchSimulator needs numpy")
+        self.games = games
+        self.max_plies = max_plies
+        self.rng = np.random.default_rng(seed)
+        perm, src, dest = _move_tables()
+        self.perm = np.array(perm, dtype=np.intp)
+        self.src = np.array(src, dtype=np.intp)
+        self.dest = np.array(dest, dtype=np.intp)
+        self.reset()
+
+    # boards is (games, 25) or (games, 5, 5); to_move a symbol per game or
+    # one symbol for all.
+    def reset(self, boards=None, to_move=1):
+        if boards is None:
+            self.boards = np.zeros((self.games, CELLS), dtype=np.int8)
+        else:
+            self.boards = np.array(boards, dtype=np.int8).reshape(self.games, CELLS)
+        self.to_move = np.empty(self.games, dtype=np.int8)
+        self.to_move[:] = to_move
+        # result: winning symbol of a finished game, 0 for a draw.
+        self.result = np.zeros(self.games, dtype=np.int8)
+        self.done = np.zeros(self.games, dtype=bool)
+        self.plies = np.zeros(self.games, dtype=np.int32)
+
+    def reset_masks(self, xs, os, to_move=1):
+        self.reset(masks_to_array(xs, os), to_move)
+
+    # (len(games), NUM_MOVES) bool: a move is legal unless the opponent
+    # owns its source cell.
+    def legal_masks(self, games):
+        return self.boards[games][:, self.src] != -self.to_move[games, None]
+
+    # One uniformly random legal move per row of legal, or -1 for a row
+    # without any.
+    def sample_moves(self, legal):
+        keys = self.rng.random(legal.shape, dtype=np.float32)
+        keys[~legal] = -1.0
+        moves = keys.argmax(axis=1)
+        moves[~legal.any(axis=1)] = -1
+        return moves
+
+    # (len(boards),) x_five and o_five flags: a line sums to 5 (or -5)
+    # exactly when X (or O) owns all of it.
+    def fives(self, boards):
+        sums = boards @ LINE_INCIDENCE
+        return (sums == 5).any(axis=1), (sums == -5).any(axis=1)
+
+    # Plays one random move in every running game. Returns how many games
+    # are still running.
+    def step(self):
+        games = np.flatnonzero(~self.done)
+        if len(games) == 0:
+            return 0
+        symbols = self.to_move[games]
+        moves = self.sample_moves(self.legal_masks(games))
+        # A side without a legal move ends the game as a draw.
+        stuck = moves < 0
+        self.done[games[stuck]] = True
+        games, symbols, moves = games[~stuck], symbols[~stuck], moves[~stuck]
+
+        boards = np.take_along_axis(self.boards[games], self.perm[moves], axis=1)
+        boards[np.arange(len(games)), self.dest[moves]] = symbols
+        self.boards[games] = boards
+        self.plies[games] += 1
+
+        # Same rule as the referee: five for both sides loses for the mover.
+        x_five, o_five = self.fives(boards)
+        over = x_five | o_five
+        self.result[games] = np.where(x_five & o_five, -symbols, np.where(x_five, 1, np.where(o_five, -1, 0)))
+        self.done[games[over | (self.plies[games] >= self.max_plies)]] = True
+        self.to_move[games] = -symbols
+        return int((~self.done).sum())
+
+    # Plays every game to the end and returns the results.
+    def run(self):
+        while self.step():
+            pass
+        return self.result
+
+
+# Winning symbol (0 for a draw) of one random playout from each position
+# (xs[i], os[i]) with symbols[i] to move.
+def random_playouts(xs, os, symbols, max_plies=100, seed=None):
+    simulator = BatchSimulator(len(xs), max_plies, seed)
+    simulator.reset_masks(xs, os, symbols)
+    return simulator.run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Random Quixo self-play, many games at once")
+    parser.add_argument('--games', type=int, default=100000)
+    parser.add_argument('--max-plies', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    simulator = BatchSimulator(args.games, args.max_plies, args.seed)
+    start = time.perf_counter()
+    result = simulator.run()
+    elapsed = time.perf_counter() - start
+    games = len(result)
+    print("%d games in %.2fs (%.0f games/s, %.0f plies/s)" % (
+        games, elapsed, games / elapsed, simulator.plies.sum() / elapsed))
+    print("X wins %.1f%%, O wins %.1f%%, draws %.1f%%, %.1f plies per game" % (
+        100 * (result == 1).mean(), 100 * (result == -1).mean(), 100 * (result == 0).mean(),
+        simulator.plies.mean()))
+
+
+if __name__ == "__main__":
+    main()
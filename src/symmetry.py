@@ -0,0 +1,109 @@
+"""
+    The 8 symmetries of the board (rotations and reflections).
+
+    canonical() maps a board to the smallest of its 8 images, so the
+    transposition table and the opening book only hold one entry per
+    class of symmetric positions. Moves are mapped through the same
+    transform with MOVE_TRANSFORM.
+"""
+
+from bitboard import SIZE, ALL_MOVES, MOVE_SRC, MOVE_DEST
+
+_LAST = SIZE - 1
+
+TRANSFORMS = [
+    lambda row, col: (row, col),
+    lambda row, col: (col, _LAST - row),
+    lambda row, col: (_LAST - row, _LAST - col),
+    lambda row, col: (_LAST - col, row),
+    lambda row, col: (row, _LAST - col),
+    lambda row, col: (_LAST - row, col),
+    lambda row, col: (col, row),
+    lambda row, col: (_LAST - col, _LAST - row),
+]
+NUM_TRANSFORMS = len(TRANSFORMS)
+
+
+def _image_bit(t, bit):
+    cell = bit.bit_length() - 1
+    row, col = TRANSFORMS[t](cell // SIZE, cell % SIZE)
+    return 1 << (row * SIZE + col)
+
+
+def _build_row_tables():
+    # tables[t][row][bits] is the image under transform t of a row whose
+    # 5 cells are given by bits.
+    tables = []
+    for t in range(NUM_TRANSFORMS):
+        rows = []
+        for row in range(SIZE):
+            images = []
+            for bits in range(1 << SIZE):
+                image = 0
+                for col in range(SIZE):
+                    if bits >> col & 1:
+                        image |= _image_bit(t, 1 << (row * SIZE + col))
+                images.append(image)
+            rows.append(images)
+        tables.append(rows)
+    return tables
+
+
+_ROW_TABLES = _build_row_tables()
+
+
+def transform_mask(mask, t):
+    r0, r1, r2, r3, r4 = _ROW_TABLES[t]
+    return r0[mask & 31] | r1[mask >> 5 & 31] | r2[mask >> 10 & 31] | r3[mask >> 15 & 31] | r4[mask >> 20 & 31]
+
+
+def _build_inverse():
+    inverse = []
+    cells = [1 << i for i in range(SIZE * SIZE)]
+    for t in range(NUM_TRANSFORMS):
+        for u in range(NUM_TRANSFORMS):
+            if all(transform_mask(transform_mask(c, t), u) == c for c in cells):
+                inverse.append(u)
+                break
+    return inverse
+
+
+INVERSE = _build_inverse()
+
+
+def _build_move_transform():
+    # A move is identified by the cell it picks and the cell it pushes
+    # into, so its image is the move between the images of both cells.
+    by_cells = {(MOVE_SRC[m], MOVE_DEST[m]): m for m in ALL_MOVES}
+    return [[by_cells[(_image_bit(t, MOVE_SRC[m]), _image_bit(t, MOVE_DEST[m]))] for m in ALL_MOVES]
+            for t in range(NUM_TRANSFORMS)]
+
+
+MOVE_TRANSFORM = _build_move_transform()
+
+
+def transform(x, o, t):
+    return transform_mask(x, t), transform_mask(o, t)
+
+
+def canonical(x, o):
+    # Returns the smallest image (compared as (x, o)) and the transform
+    # that produced it.
+    best_x, best_o, best_t = x, o, 0
+    for t in range(1, NUM_TRANSFORMS):
+        r0, r1, r2, r3, r4 = _ROW_TABLES[t]
+        tx = r0[x & 31] | r1[x >> 5 & 31] | r2[x >> 10 & 31] | r3[x >> 15 & 31] | r4[x >> 20 & 31]
+        if tx > best_x:
+            continue
+        to = r0[o & 31] | r1[o >> 5 & 31] | r2[o >> 10 & 31] | r3[o >> 15 & 31] | r4[o >> 20 & 31]
+        if tx < best_x or to < best_o:
+            best_x, best_o, best_t = tx, to, t
+    return best_x, best_o, best_t
+
+
+def to_canonical_move(move, t):
+    return MOVE_TRANSFORM[t][move]
+
+
+def from_canonical_move(move, t):
+    return MOVE_TRANSFORM[INVERSE[t]][move]
@@ -0,0 +1,172 @@
+"""
+    Retrograde tablebase for positions with no empty cells.
+
+    On a full board every move keeps the board full, so these positions
+    form a closed class. A position is indexed by the 25-bit mask of the
+    side to move, which covers X to move and O to move with one table of
+    2^25 entries. Each entry is one byte from the mover's point of view:
+    0 is a draw, 1..127 a win in that many plies and 128 + n a loss in n
+    plies (distances above 127 are stored as 127).
+
+    The file is read through mmap, so worker processes share the pages
+    of one copy instead of loading it each.
+
+    python tablebase.py build quixo_full.tb
+"""
+
+import argparse
+import mmap
+import os
+import time
+
+from bitboard import (ALL_MOVES, CELLS, FULL, MOVE_DEST, MOVE_SEG, MOVE_SHL, MOVE_SHR, MOVE_SPAN,
+                      MOVE_SRC)
+from lines import ANTI_DIAG_MASK, COL_MASKS, DIAG_MASK
+
+MAGIC = b'QXTB0001'
+HEADER_SIZE = len(MAGIC)
+NUM_POSITIONS = 1 << CELLS
+
+DRAW = 0
+WIN = 1
+LOSS = -1
+MAX_DISTANCE = 127
+LOSS_BASE = 128
+
+# Search score of a proven win for the side the bot plays; shorter wins
+# score higher.
+WIN_SCORE = 1000000
+
+
+def decode(code):
+    if code == 0:
+        return DRAW, 0
+    if code < LOSS_BASE:
+        return WIN, code
+    return LOSS, code - LOSS_BASE
+
+
+class Tablebase:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:HEADER_SIZE] != MAGIC or len(self.map) != HEADER_SIZE + NUM_POSITIONS:
+            self.map.close()
+            raise ValueError("%s is not a full-board Quixo tablebase" % path)
+        self.probes = 0
+
+    def close(self):
+        self.map.close()
+
+    # (result, distance) for the side to move, or None if the board has
+    # empty cells.
+    def probe(self, x, o, symbol):
+        if (x | o) != FULL:
+            return None
+        self.probes += 1
+        return decode(self.map[HEADER_SIZE + (x if symbol == 1 else o)])
+
+    # Search score from bot_symbol's point of view.
+    def score(self, x, o, symbol, bot_symbol):
+        entry = self.probe(x, o, symbol)
+        if entry is None:
+            return None
+        result, distance = entry
+        if result == DRAW:
+            return 0
+        value = WIN_SCORE - distance if result == WIN else distance - WIN_SCORE
+        return value if symbol == bot_symbol else -value
+
+
+def _has_five(np, m):
+    rows = (m & (m >> 1) & (m >> 2) & (m >> 3) & (m >> 4) & COL_MASKS[0]) != 0
+    cols = (m & (m >> 5) & (m >> 10) & (m >> 15) & (m >> 20)) != 0
+    diag = (m & DIAG_MASK) == DIAG_MASK
+    anti = (m & ANTI_DIAG_MASK) == ANTI_DIAG_MASK
+    return rows | cols | diag | anti
+
+
+def _shift(np, mask, move):
+    span = np.uint32(MOVE_SPAN[move])
+    seg = np.uint32(MOVE_SEG[move])
+    return (mask & ~span) | (((mask & seg) >> np.uint32(MOVE_SHR[move])) << np.uint32(MOVE_SHL[move]))
+
+
+def _solve_chunk(np, table, states):
+    # One Jacobi step over some unresolved states: returns the new codes
+    # (0 where the state stays unresolved).
+    count = len(states)
+    win_dist = np.full(count, 255, dtype=np.int32)
+    loss_dist = np.zeros(count, dtype=np.int32)
+    all_lose = np.ones(count, dtype=bool)
+    any_legal = np.zeros(count, dtype=bool)
+    opponent = np.uint32(FULL) ^ states
+    for move in ALL_MOVES:
+        legal = (states & np.uint32(MOVE_SRC[move])) != 0
+        new_x = _shift(np, states, move) | np.uint32(MOVE_DEST[move])
+        new_o = _shift(np, opponent, move)
+        x_five = _has_five(np, new_x)
+        o_five = _has_five(np, new_o)
+        # Completing a line for both sides loses for the mover.
+        immediate_win = legal & x_five & ~o_five
+        immediate_loss = legal & o_five
+        quiet = legal & ~x_five & ~o_five
+        child = table[new_o]
+        child_win = quiet & (child > 0) & (child < LOSS_BASE)
+        child_loss = quiet & (child >= LOSS_BASE)
+        win_dist = np.where(immediate_win, np.minimum(win_dist, 1), win_dist)
+        win_dist = np.where(child_loss, np.minimum(win_dist, child.astype(np.int32) - LOSS_BASE + 1), win_dist)
+        loss_dist = np.where(immediate_loss, np.maximum(loss_dist, 1), loss_dist)
+        loss_dist = np.where(child_win, np.maximum(loss_dist, child.astype(np.int32) + 1), loss_dist)
+        all_lose &= ~legal | immediate_loss | child_win
+        any_legal |= legal
+    codes = np.zeros(count, dtype=np.uint8)
+    wins = win_dist < 255
+    codes[wins] = np.minimum(win_dist[wins], MAX_DISTANCE)
+    losses = ~wins & all_lose & any_legal
+    codes[losses] = LOSS_BASE + np.minimum(loss_dist[losses], MAX_DISTANCE)
+    return codes
+
+
+def build(path, chunk_size=1 << 20, max_passes=None, log=print):
+    import numpy as np
+
+    table = np.zeros(NUM_POSITIONS, dtype=np.uint8)
+    unresolved = np.arange(NUM_POSITIONS, dtype=np.uint32)
+    passes = 0
+    while len(unresolved) and (max_passes is None or passes < max_passes):
+        start = time.perf_counter()
+        codes = np.concatenate([_solve_chunk(np, table, unresolved[i:i + chunk_size])
+                                for i in range(0, len(unresolved), chunk_size)])
+        solved = codes != 0
+        passes += 1
+        log("pass %d: %d resolved, %d left (%.1fs)" % (passes, solved.sum(), (~solved).sum(),
+                                                       time.perf_counter() - start))
+        if not solved.any():
+            break
+        table[unresolved[solved]] = codes[solved]
+        unresolved = unresolved[~solved]
+    # Whatever is still unresolved is a draw (code 0).
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        table.tofile(f)
+    os.replace(tmp_path, path)
+    return passes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-board Quixo tablebase")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_parser = commands.add_parser('build', help="solve every full board and write the table")
+    build_parser.add_argument('path')
+    build_parser.add_argument('--chunk-size', type=int, default=1 << 20)
+    build_parser.add_argument('--max-passes', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build(args.path, args.chunk_size, args.max_passes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+    Parallel tournament runner for QuixoReferee.
+
+    Games are played in pairs with the colours swapped, every game with
+    its own RNG seed, and the pairs are sharded across worker processes.
+    The referee runs silently; only the merged statistics are printed.
+    With --processes every player also runs in its own worker process
+    (player_process.py), so a move that misses --move-timeout is cut off
+    instead of running on in the background. With --records DIR every
+    game is logged to binary record files in DIR (records.py), one set of
+    chunks per worker.
+
+    python tournament.py quixo_bot:QuixoBot quixo_random:QuixoRandomBot --games 10000 --workers 16 \\
+        --options-a '{"time_budget": 0.05}'
+"""
+
+import argparse
+import json
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.util import Finalize
+
+from evaluator import QuixoReferee
+from instrument import summarize
+from player_process import PlayerProcess, load_player
+from records import GameRecordWriter
+
+COUNTERS = ('wins', 'draws', 'losses', 'illegal_a', 'illegal_b', 'timeouts_a', 'timeouts_b',
+            'nodes_a', 'nodes_b', 'search_time_a', 'search_time_b', 'stat_moves_a', 'stat_moves_b')
+
+_players = None
+_records = None
+
+
+def _init_worker(spec_a, spec_b, processes=False, records=None):
+    global _players, _records
+    if processes:
+        _players = (PlayerProcess(spec_a, 1), PlayerProcess(spec_b, -1))
+    else:
+        _players = (load_player(spec_a, 1), load_player(spec_b, -1))
+    if records is not None:
+        _records = GameRecordWriter(records)
+    # Runs as the worker exits, before multiprocessing waits for its
+    # children: the process pool of a QuixoBot with workers > 1 is not
+    # daemonic and would keep the worker alive.
+    Finalize(None, _close_players, exitpriority=10)
+
+
+def _close_players():
+    for player in _players:
+        close = getattr(player, 'close', None)
+        if close is not None:
+            close()
+    if _records is not None:
+        _records.close()
+
+
+def _reset(player, symbol, seed):
+    # A player in its own process does not see random.seed here, so its
+    # worker gets a seed of its own.
+    if isinstance(player, PlayerProcess):
+        player.reset(symbol, seed)
+    else:
+        player.reset(symbol)
+
+
+# Plays one game and returns its counters from player A's point of view.
+def play_game(player_a, player_b, a_first, seed, limit_turns, move_timeout, records=None):
+    random.seed(seed)
+    first, second = (player_a, player_b) if a_first else (player_b, player_a)
+    _reset(first, 1, 2 * seed)
+    _reset(second, -1, 2 * seed + 1)
+    referee = QuixoReferee(first, second, verbose=False, move_timeout=move_timeout, collect_stats=True,
+                           records=records)
+    winner = referee.play_game(limit_turns)
+    counts = dict.fromkeys(COUNTERS, 0)
+    if winner == 0:
+        counts['draws'] = 1
+    elif winner == player_a.symbol:
+        counts['wins'] = 1
+    else:
+        counts['losses'] = 1
+    counts['illegal_a'] = referee.illegal_moves[player_a.symbol]
+    counts['illegal_b'] = referee.illegal_moves[player_b.symbol]
+    counts['timeouts_a'] = referee.timeouts[player_a.symbol]
+    counts['timeouts_b'] = referee.timeouts[player_b.symbol]
+    # Search statistics of instrumented players (QuixoBot(instrument=True)).
+    for player, suffix in ((player_a, '_a'), (player_b, '_b')):
+        summary = summarize(referee.search_stats[player.symbol])
+        counts['nodes' + suffix] = summary['nodes']
+        counts['search_time' + suffix] = summary['elapsed']
+        counts['stat_moves' + suffix] = summary['moves']
+    return counts
+
+
+def _play_pairs(pairs, seed, limit_turns, move_timeout):
+    player_a, player_b = _players
+    totals = dict.fromkeys(COUNTERS, 0)
+    for pair in pairs:
+        for game in (2 * pair, 2 * pair + 1):
+            counts = play_game(player_a, player_b, game % 2 == 0, seed + game, limit_turns, move_timeout, _records)
+            for key in COUNTERS:
+                totals[key] += counts[key]
+    return totals
+
+
+def elo_difference(wins, draws, losses, z=1.96):
+    # Elo of A over B with a Wilson score interval on the score fraction
+    # (a draw counts half). Unlike the normal approximation it does not
+    # collapse to a point at a 0% or 100% score: the bound on the side
+    # away from the observed score stays finite.
+    games = wins + draws + losses
+    if games == 0:
+        return 0.0, (-math.inf, math.inf)
+    score = (wins + 0.5 * draws) / games
+    denominator = 1 + z * z / games
+    center = (score + z * z / (2 * games)) / denominator
+    margin = z * math.sqrt(score * (1 - score) / games + z * z / (4 * games * games)) / denominator
+
+    def to_elo(s):
+        if s <= 0:
+            return -math.inf
+        if s >= 1:
+            return math.inf
+        return -400 * math.log10(1 / s - 1)
+
+    # At a 0% or 100% score the interval ends exactly at 0 or 1.
+    low = 0.0 if score == 0 else center - margin
+    high = 1.0 if score == 1 else center + margin
+    return to_elo(score), (to_elo(low), to_elo(high))
+
+
+def run_tournament(spec_a, spec_b, games, workers=1, seed=0, limit_turns=100, move_timeout=1, shard_size=8,
+                   processes=False, records=None):
+    pairs = list(range((games + 1) // 2))
+    shards = [pairs[i:i + shard_size] for i in range(0, len(pairs), shard_size)]
+    totals = dict.fromkeys(COUNTERS, 0)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(spec_a, spec_b, processes, records)) as executor:
+        futures = [executor.submit(_play_pairs, shard, seed, limit_turns, move_timeout) for shard in shards]
+        for future in futures:
+            for key, value in future.result().items():
+                totals[key] += value
+    totals['games'] = 2 * len(pairs)
+    totals['elapsed'] = time.perf_counter() - start
+    elo, interval = elo_difference(totals['wins'], totals['draws'], totals['losses'])
+    totals['elo'] = elo
+    totals['elo_interval'] = interval
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play a tournament between two Quixo players")
+    parser.add_argument('player_a', help="module:Class, e.g. quixo_bot:QuixoBot")
+    parser.add_argument('player_b')
+    parser.add_argument('--options-a', type=json.loads, default={})
+    parser.add_argument('--options-b', type=json.loads, default={})
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--limit-turns', type=int, default=100)
+    parser.add_argument('--move-timeout', type=float, default=1)
+    parser.add_argument('--processes', action='store_true',
+                        help="run each player in its own process and kill it on a timeout")
+    parser.add_argument('--records', default=None, help="directory to log every game to (records.py)")
+    args = parser.parse_args()
+
+    result = run_tournament((args.player_a, args.options_a), (args.player_b, args.options_b), args.games,
+                            args.workers, args.seed, args.limit_turns, args.move_timeout, processes=args.processes, records=args.records)
+    low, high = result['elo_interval']
+    print("%d games in %.1fs" % (result['games'], result['elapsed']))
+    print("A: %s  B: %s" % (args.player_a, args.player_b))
+    print("A wins %d, draws %d, losses %d" % (result['wins'], result['draws'], result['losses']))
+    print("illegal moves: A %d, B %d" % (result['illegal_a'], result['illegal_b']))
+    print("timeouts: A %d, B %d" % (result['timeouts_a'], result['timeouts_b']))
+    print("Elo difference: %+.1f (95%% CI %+.1f .. %+.1f)" % (result['elo'], low, high))
+    for name, suffix in (('A', '_a'), ('B', '_b')):
+        if result['stat_moves' + suffix]:
+            print("search %s: %d moves, %.0f nodes/move, %.0f nodes/s" % (
+                name, result['stat_moves' + suffix], result['nodes' + suffix] / result['stat_moves' + suffix],
+                result['nodes' + suffix] / result['search_time' + suffix] if result['search_time' + suffix] else 0))
+
+
+if __name__ == "__main__":
+    main()
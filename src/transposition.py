@@ -0,0 +1,117 @@
+"""
+    Zobrist-hashed transposition table with a fixed memory cap.
+
+    Each bucket has two slots: a depth-preferred one that keeps the
+    deepest result of the current game turn, and an always-replace one
+    that takes whatever the first slot rejected.
+"""
+
+import random
+
+from bitboard import SIZE
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Rough size of one slot in CPython: the list pointer plus the entry
+# tuple and the integers it holds.
+ENTRY_BYTES = 160
+
+_rng = random.Random(0x5155)
+_CELL_KEYS = [(_rng.getrandbits(64), _rng.getrandbits(64)) for _ in range(SIZE * SIZE)]
+SIDE_KEY = _rng.getrandbits(64)
+
+
+def _build_row_keys():
+    # The xor of the cell keys of a whole row, indexed by the 5 X bits and
+    # the 5 O bits of that row, so a board hashes in 5 lookups.
+    tables = []
+    for row in range(SIZE):
+        table = []
+        for code in range(1 << (2 * SIZE)):
+            x_bits, o_bits = code >> SIZE, code & ((1 << SIZE) - 1)
+            key = 0
+            for col in range(SIZE):
+                x_key, o_key = _CELL_KEYS[row * SIZE + col]
+                if x_bits >> col & 1:
+                    key ^= x_key
+                elif o_bits >> col & 1:
+                    key ^= o_key
+            table.append(key)
+        tables.append(table)
+    return tables
+
+
+_ROW_KEYS = _build_row_keys()
+
+
+def zobrist_hash(x, o, symbol):
+    r0, r1, r2, r3, r4 = _ROW_KEYS
+    key = (r0[(x & 31) << 5 | (o & 31)]
+           ^ r1[(x >> 5 & 31) << 5 | (o >> 5 & 31)]
+           ^ r2[(x >> 10 & 31) << 5 | (o >> 10 & 31)]
+           ^ r3[(x >> 15 & 31) << 5 | (o >> 15 & 31)]
+           ^ r4[(x >> 20 & 31) << 5 | (o >> 20 & 31)])
+    return key ^ SIDE_KEY if symbol == -1 else key
+
+
+class TranspositionTable:
+    def __init__(self, size_mb=16):
+        self.size_mb = size_mb
+        self.num_buckets = max(1, int(size_mb * (1 << 20)) // (2 * ENTRY_BYTES))
+        self.clear()
+
+    def clear(self):
+        # Entries are (key, depth, score, bound, move, generation).
+        self.deep = [None] * self.num_buckets
+        self.recent = [None] * self.num_buckets
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    # Called once per turn: entries from earlier turns stay usable but no
+    # longer protect their depth-preferred slot.
+    def new_search(self):
+        self.generation += 1
+
+    def probe(self, key):
+        index = key % self.num_buckets
+        entry = self.deep[index]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        other = self.recent[index]
+        if other is not None and other[0] == key:
+            self.hits += 1
+            return other
+        self.misses += 1
+        if entry is not None or other is not None:
+            self.collisions += 1
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        index = key % self.num_buckets
+        entry = (key, depth, score, bound, move, self.generation)
+        self.stores += 1
+        deep = self.deep[index]
+        if deep is None or deep[0] == key or deep[5] != self.generation or depth >= deep[1]:
+            if deep is not None and deep[0] != key:
+                self.recent[index] = deep
+            self.deep[index] = entry
+        else:
+            self.recent[index] = entry
+
+    def stats(self):
+        probes = self.hits + self.misses
+        return {
+            'size_mb': self.size_mb,
+            'entries': 2 * self.num_buckets,
+            'hits': self.hits,
+            'misses': self.misses,
+            'collisions': self.collisions,
+            'stores': self.stores,
+            'hit_rate': self.hits / probes if probes else 0.0,
+        }
@@ -0,0 +1,151 @@
+"""
+    Offline tuning of the line weights from game records.
+
+    Every recorded position is labelled with the final result from the
+    mover's point of view (1 win, 0.5 draw, 0 loss). Its features are the
+    pattern counts the evaluator scores: for 4, 3, 2 and 1 pieces, the
+    lines the mover holds alone with that many pieces minus the lines the
+    opponent holds alone with that many, so the score of a position is
+    the dot product of the features and weights[1:]. Five in a line never
+    occurs before a move, so weights[0] is kept as it is.
+
+    Features are extracted in NumPy a chunk of records at a time and only
+    counted: every position adds to a histogram over (features, result),
+    so memory does not grow with the number of positions. The fit works
+    on the histogram, Texel style: K is chosen so that sigmoid(K * score)
+    best predicts the results with the current weights, then logistic
+    regression (Newton's method) fits new weights on the same scale.
+
+    python tune.py games/ --output weights.json
+    python tournament.py quixo_bot:QuixoBot quixo_bot:QuixoBot --options-a '{"weights": "weights.json"}'
+"""
+
+import argparse
+
+import numpy as np
+
+from batch_eval import count_lines, masks_to_array
+from lines import LINE_MASKS
+from patterns import DEFAULT_WEIGHTS, load_weights, save_weights
+from records import read_arrays
+
+# Features: net pure lines with 4, 3, 2 and 1 pieces (weights[1:]).
+NUM_FEATURES = 4
+# Net counts go from -12 to 12.
+RANGE = 2 * len(LINE_MASKS) + 1
+NUM_KEYS = RANGE ** NUM_FEATURES
+CHUNK = 1 << 16
+
+_PIECES = np.arange(4, 0, -1, dtype=np.int8)[:, None, None]
+
+
+# (N, NUM_FEATURES) int8 features of N positions (packed as in records)
+# for the side that moves in each.
+def features(boards, sides):
+    x = boards & np.uint64(0x1FFFFFF)
+    o = boards >> np.uint64(25)
+    # The mover's pieces as 1 and the opponent's as -1.
+    own_counts, opp_counts = count_lines(masks_to_array(x, o) * sides[:, None])
+    # (4, N, 12) comparisons against 4, 3, 2, 1 pieces.
+    own_lines = (own_counts == _PIECES) & (opp_counts == 0)
+    opp_lines = (opp_counts == _PIECES) & (own_counts == 0)
+    return (own_lines.sum(axis=2, dtype=np.int8) - opp_lines.sum(axis=2, dtype=np.int8)).T
+
+
+# Histogram of (features, result) over every position of the records
+# from min_ply on: counts[key * 3 + label] with label 0 loss, 1 draw,
+# 2 win for the mover.
+def histogram(paths, min_ply=0, chunk=CHUNK):
+    counts = np.zeros(NUM_KEYS * 3, dtype=np.int64)
+    for records in read_arrays(paths, chunk):
+        records = records[records['ply'] >= min_ply]
+        if not len(records):
+            continue
+        sides = records['side']
+        key = np.zeros(len(records), dtype=np.int64)
+        for column in features(records['boards'], sides).T:
+            key = key * RANGE + (column.astype(np.int64) + RANGE // 2)
+        label = np.sign(records['result'].astype(np.int64) * sides) + 1
+        counts += np.bincount(key * 3 + label, minlength=NUM_KEYS * 3)
+    return counts
+
+
+# Distinct feature rows, their number of positions and their mean label.
+def fit_data(counts):
+    counts = counts.reshape(NUM_KEYS, 3)
+    totals = counts.sum(axis=1)
+    keys = np.flatnonzero(totals)
+    rows = np.empty((len(keys), NUM_FEATURES), dtype=np.float64)
+    rest = keys.copy()
+    for i in range(NUM_FEATURES - 1, -1, -1):
+        rows[:, i] = rest % RANGE - RANGE // 2
+        rest //= RANGE
+    n = totals[keys].astype(np.float64)
+    y = (counts[keys, 2] + 0.5 * counts[keys, 1]) / n
+    return rows, n, y
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+# Mean cross-entropy of sigmoid(rows @ w) against y.
+def log_loss(rows, n, y, w):
+    p = np.clip(_sigmoid(rows @ w), 1e-12, 1 - 1e-12)
+    return float(-(n * (y * np.log(p) + (1 - y) * np.log(1 - p))).sum() / n.sum())
+
+
+# Weighted logistic regression by Newton's method, with an L2 penalty.
+def logistic_fit(rows, n, y, l2=0.0, iterations=50, tolerance=1e-10):
+    w = np.zeros(rows.shape[1])
+    for _ in range(iterations):
+        p = _sigmoid(rows @ w)
+        gradient = rows.T @ (n * (p - y)) + l2 * w
+        hessian = (rows * (n * p * (1 - p))[:, None]).T @ rows + l2 * np.eye(rows.shape[1])
+        step = np.linalg.lstsq(hessian, gradient, rcond=None)[0]
+        w -= step
+        if np.abs(step).max() < tolerance:
+            break
+    return w
+
+
+# Returns the tuned weights, K and the log loss before and after.
+def tune(counts, weights=DEFAULT_WEIGHTS, l2=1.0):
+    rows, n, y = fit_data(counts)
+    if not len(rows):
+        raise ValueError("no positions to tune on")
+    base = np.array(weights[1:], dtype=np.float64)
+    scores = rows @ base
+    k = logistic_fit(scores[:, None], n, y)[0]
+    if k <= 0:
+        raise ValueError("the current weights do not predict the results (K = %g)" % k)
+    fitted = logistic_fit(rows, n, y, l2)
+    tuned = (weights[0],) + tuple(int(round(value / k)) for value in fitted)
+    before = log_loss(rows, n, y, k * base)
+    after = log_loss(rows, n, y, k * np.array(tuned[1:], dtype=np.float64))
+    return tuned, k, before, after
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit the line weights to recorded games")
+    parser.add_argument('paths', nargs='+', help="record files or directories (records.py)")
+    parser.add_argument('--output', default=None, help="weight file to write (patterns.save_weights)")
+    parser.add_argument('--weights', default=None, help="weight file to start from instead of the defaults")
+    parser.add_argument('--min-ply', type=int, default=0, help="skip the first plies of every game")
+    parser.add_argument('--l2', type=float, default=1.0)
+    parser.add_argument('--chunk', type=int, default=CHUNK, help="records per extraction chunk")
+    args = parser.parse_args()
+
+    weights = load_weights(args.weights) if args.weights else DEFAULT_WEIGHTS
+    counts = histogram(args.paths, args.min_ply, args.chunk)
+    print("%d positions" % counts.sum())
+    tuned, k, before, after = tune(counts, weights, args.l2)
+    print("K = %.5f" % k)
+    print("weights %s: log loss %.5f" % (list(weights), before))
+    print("tuned   %s: log loss %.5f" % (list(tuned), after))
+    if args.output:
+        save_weights(args.output, tuned)
+
+
+if __name__ == "__main__":
+    main()
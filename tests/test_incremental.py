@@ -0,0 +1,49 @@
+import random
+
+from bitboard import BitBoard, generate_moves
+from incremental import IncrementalEvaluator
+from quixo_bot import GameNode, LINE_SCORES
+
+
+def random_board(rng):
+    return BitBoard.from_list([[rng.choice([0, 0, 1, -1]) for _ in range(5)] for _ in range(5)])
+
+
+def state(evaluator):
+    return evaluator.score, list(evaluator.x_counts), list(evaluator.o_counts), len(evaluator.history)
+
+
+def test_matches_full_evaluation_on_random_games():
+    rng = random.Random(0)
+    evaluator = IncrementalEvaluator(LINE_SCORES)
+    for _ in range(200):
+        board = random_board(rng)
+        evaluator.reset(board.x, board.o)
+        symbol = rng.choice([1, -1])
+        for _ in range(rng.randint(1, 30)):
+            move = rng.choice(generate_moves(board.x, board.o, symbol))
+            board.make(move, symbol)
+            evaluator.make(board.x, board.o, move)
+            for bot_symbol in (1, -1):
+                assert evaluator.score_for(bot_symbol) == GameNode(board).evaluate(bot_symbol, -bot_symbol)
+            symbol = -symbol
+
+
+def test_unmake_restores_the_starting_state():
+    rng = random.Random(1)
+    evaluator = IncrementalEvaluator(LINE_SCORES)
+    for _ in range(200):
+        board = random_board(rng)
+        evaluator.reset(board.x, board.o)
+        start = state(evaluator)
+        symbol = rng.choice([1, -1])
+        plies = rng.randint(1, 30)
+        for _ in range(plies):
+            move = rng.choice(generate_moves(board.x, board.o, symbol))
+            board.make(move, symbol)
+            evaluator.make(board.x, board.o, move)
+            symbol = -symbol
+        for _ in range(plies):
+            board.unmake()
+            evaluator.unmake()
+        assert state(evaluator) == start
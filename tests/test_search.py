@@ -0,0 +1,38 @@
+import random
+
+import pytest
+
+from batch_eval import HAS_NUMPY
+from bitboard import BitBoard
+from lines import five_in_a_row
+from ordering import MAX_PLY
+from quixo_bot import QuixoBot
+
+
+def positions(count, seed=0):
+    rng = random.Random(seed)
+    found = []
+    while len(found) < count:
+        board = BitBoard.from_list([[rng.choice([0, 0, 1, -1]) for _ in range(5)] for _ in range(5)])
+        x_five, o_five = five_in_a_row(board.x, board.o)
+        if not (x_five or o_five):
+            found.append((board.x, board.o, rng.choice([1, -1])))
+    return found
+
+
+def root_result(x, o, symbol, depth, batch_leaves, pvs, lmr):
+    bot = QuixoBot(symbol, depth=depth, time_budget=None, tt_size_mb=0, batch_leaves=batch_leaves, pvs=pvs, lmr=lmr)
+    # LMR runs, but never reduces a move.
+    bot.searcher.lmr_min_depth = MAX_PLY + 1
+    return bot.searcher.search(BitBoard(x, o), depth)
+
+
+# Without a transposition table and without reductions, PVS (alone and
+# with the rest of LMR) must find the root move and value of alpha-beta.
+@pytest.mark.parametrize('batch_leaves', [False, pytest.param(True, marks=pytest.mark.skipif(not HAS_NUMPY, reason="needs numpy"))])
+@pytest.mark.parametrize('depth', [1, 2, 3, 4])
+def test_pvs_matches_alpha_beta(depth, batch_leaves):
+    for x, o, symbol in positions(12):
+        expected = root_result(x, o, symbol, depth, batch_leaves, False, False)
+        assert root_result(x, o, symbol, depth, batch_leaves, True, False) == expected
+        assert root_result(x, o, symbol, depth, batch_leaves, True, True) == expected